@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rankingProject.settings')
 
 application = get_asgi_application()
+
+# Con ASGI el event loop dura lo que el worker: las vistas async usan AsyncMongoClient
+from songReviews.mongo_pool import enable_async_client  # noqa: E402
+
+enable_async_client()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Comandos Mongo / tiempos por vista (/metrics y Server-Timing en DEBUG)
+    'songReviews.metrics.MongoMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -70,6 +73,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'rankingProject.wsgi.application'
+ASGI_APPLICATION = 'rankingProject.asgi.application'
 
 
 # Database
@@ -83,12 +87,97 @@ DATABASES = {
     "mongodb": {
           "ENGINE": "django_mongodb_backend",
           "HOST": "mongodb://localhost:27017",
-          "NAME": "songreviews",
+          # MONGO_DB_NAME=songreviews_bench para seed_synthetic / bench
+          "NAME": os.environ.get("MONGO_DB_NAME", "songreviews"),
+          # Se pasan a MongoClient (backend y songReviews.mongo_pool)
+          "OPTIONS": {
+              "maxPoolSize": 50,
+              "minPoolSize": 0,
+              "maxIdleTimeMS": 60000,
+              "connectTimeoutMS": 5000,
+              "serverSelectionTimeoutMS": 5000,
+              "socketTimeoutMS": 30000,
+              "waitQueueTimeoutMS": 5000,
+              "w": "majority",
+              "readConcernLevel": "local",
+              "readPreference": "primaryPreferred",
+          },
     },
 }
 
 DATABASE_ROUTERS = ['rankingProject.db_routers.MongoRouter']
 
+# File uploads: siempre a fichero temporal para poder leer CSVs grandes en streaming
+FILE_UPLOAD_HANDLERS = [
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
+# Background CSV imports (songReviews/jobs.py)
+IMPORT_JOBS = {
+    "WORKERS": 2,
+    "UPLOAD_DIR": BASE_DIR / "uploads",
+    "STALE_SECONDS": 120,
+}
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# "stats" es local a cada proceso. Con varios workers usar una caché compartida, p.ej.:
+#   "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": BASE_DIR / "cache" / "stats"
+#   "BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "stats_cache"  (manage.py createcachetable)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "stats": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "stats",
+    },
+}
+
+# Stats cache (songReviews/stats_cache.py), en segundos
+STATS_CACHE = {
+    "ALIAS": "stats",
+    "TTL": 60,
+    "STALE_GRACE": 600,
+    "LOCK_TIMEOUT": 30,
+    "WAIT_SECONDS": 5,
+}
+
+# Category song lists (songReviews/categories.py), TTL en segundos
+CATEGORY_CACHE = {
+    "ALIAS": "default",
+    "TTL": 300,
+}
+
+# In-process song/category catalog (songReviews/catalog.py), tiempos en segundos
+CATALOG = {
+    "MAX_BYTES": 64 * 1024 * 1024,
+    "CHECK_SECONDS": 2,
+    "REFRESH_SECONDS": 300,
+}
+
+# Slow Mongo operations log (songReviews/slow_ops.py)
+SLOW_OPS = {
+    "ENABLED": True,
+    "THRESHOLD_MS": 100,
+    "EXPLAIN": True,
+    "EXPLAIN_SECONDS": 300,
+    "CAPPED_BYTES": 16 * 1024 * 1024,
+    "CAPPED_MAX": 5000,
+}
+
+# Song search (songReviews/search.py)
+# Alternativa: "songReviews.search.MongoTextSearchBackend" (índice de texto de Mongo)
+SONG_SEARCH = {
+    "BACKEND": "songReviews.search.InMemorySearchBackend",
+    "OPTIONS": {
+        "REFRESH_SECONDS": 300,
+        "CHECK_SECONDS": 10,
+    },
+}
+
 
 
 # Password validation
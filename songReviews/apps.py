@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from pymongo import monitoring
 
 
 class SongreviewsConfig(AppConfig):
     name = 'songReviews'
+
+    def ready(self):
+        # Antes de que se cree ningún MongoClient (los listeners se leen al crearlo)
+        from songReviews.metrics import MongoCommandCollector
+        from songReviews.slow_ops import SlowOpListener
+
+        monitoring.register(MongoCommandCollector())
+        monitoring.register(SlowOpListener())
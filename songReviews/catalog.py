@@ -0,0 +1,299 @@
+import logging
+import sys
+import threading
+import time
+from array import array
+
+from django.conf import settings
+
+from songReviews.counters import bump_version, read_versions
+from songReviews.mongo_pool import get_collection, get_db
+
+# Catálogo en memoria (uno por worker) con los datos de canciones y categorías
+# que se pintan en las vistas: nombre, artista, artwork, logo...
+#
+# Cada colección se guarda por columnas (array para los números, listas para
+# los textos, artistas con sys.intern) y un dict code -> fila. Cada tabla
+# tiene su versión en counters ("catalog_songs" y "catalog_categories",
+# invalidate_catalog, se miran cada CHECK_SECONDS) y se recarga sola cuando
+# cambia la suya o cada REFRESH_SECONDS como mucho. Cambiar las canciones de
+# una categoría solo recarga categorías (songsVersion va ahí); la tabla de
+# canciones solo cuando cambian sus datos (nombre, artista, artwork, codes).
+# Si no cabe en MAX_BYTES no se guarda y todas las consultas van a Mongo.
+# El índice de búsqueda en memoria (search.py) se construye desde la tabla
+# de canciones, así que no hace falta otra copia de songs por worker.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG = {
+    "MAX_BYTES": 64 * 1024 * 1024,
+    "CHECK_SECONDS": 2,
+    "REFRESH_SECONDS": 300,
+}
+
+# tabla -> versión en counters
+VERSION_NAMES = {"songs": "catalog_songs", "categories": "catalog_categories"}
+
+SONG_FIELDS = ("name", "artist", "artwork")
+CATEGORY_FIELDS = ("name", "logo", "description", "songsVersion")
+INTERNED = {"artist"}
+
+# Coste aproximado de una fila aparte de sus textos (entrada del dict, punteros de las listas)
+ROW_OVERHEAD = 120
+
+
+class CatalogOverBudget(Exception):
+    pass
+
+
+class _Table:
+    __slots__ = ("fields", "codes", "columns", "rows", "nbytes")
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.codes = array("q")
+        self.columns = {field: [] for field in fields}
+        self.rows = {}
+        self.nbytes = 0
+
+    def load(self, docs, budget):
+        interned = {}
+        for doc in docs:
+            if doc.get("code") is None:
+                continue
+            code = int(doc["code"])
+            if code in self.rows:
+                continue
+
+            self.rows[code] = len(self.codes)
+            self.codes.append(code)
+            self.nbytes += ROW_OVERHEAD
+            for field in self.fields:
+                value = doc.get(field)
+                if isinstance(value, str):
+                    if field in INTERNED:
+                        if value not in interned:
+                            interned[value] = sys.intern(value)
+                            self.nbytes += sys.getsizeof(value)
+                        value = interned[value]
+                    else:
+                        self.nbytes += sys.getsizeof(value)
+                self.columns[field].append(value)
+
+            if self.nbytes > budget:
+                raise CatalogOverBudget()
+        return self
+
+    def row(self, code):
+        i = self.rows.get(code)
+        if i is None:
+            return None
+        data = {"code": code}
+        for field in self.fields:
+            data[field] = self.columns[field][i]
+        return data
+
+    def all(self):
+        return [self.row(code) for code in sorted(self.rows)]
+
+    def iter_rows(self):
+        """Como all() pero sin ordenar ni montar la lista entera."""
+        return (self.row(code) for code in self.codes)
+
+
+class Catalog:
+    def __init__(self, max_bytes, check_seconds, refresh_seconds):
+        self.max_bytes = max_bytes
+        self.check_seconds = check_seconds
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._tables_by_name = {"songs": None, "categories": None}
+        self._versions = {"songs": None, "categories": None}
+        self._loaded_at = {"songs": 0.0, "categories": 0.0}
+        self._checked_at = 0.0
+        self._disabled = set()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    @property
+    def enabled(self):
+        return not self._disabled
+
+    @property
+    def _songs(self):
+        return self._tables_by_name["songs"]
+
+    @property
+    def _categories(self):
+        return self._tables_by_name["categories"]
+
+    def invalidate(self, names=("songs", "categories")):
+        for name in names:
+            self._loaded_at[name] = 0.0
+        self._checked_at = 0.0
+
+    def _stale(self, now):
+        stale = [
+            name for name in VERSION_NAMES
+            if self._versions[name] is None or now - self._loaded_at[name] > self.refresh_seconds
+        ]
+        if len(stale) < len(VERSION_NAMES) and now - self._checked_at > self.check_seconds:
+            self._checked_at = now
+            versions = read_versions(get_db(), VERSION_NAMES.values())
+            stale += [
+                name for name, version_name in VERSION_NAMES.items()
+                if name not in stale and versions[version_name] != self._versions[name]
+            ]
+        return stale
+
+    def _tables(self):
+        now = time.monotonic()
+        stale = self._stale(now)
+        if stale:
+            with self._lock:
+                # otro hilo puede haberlas recargado mientras se esperaba el lock
+                stale = [name for name in stale if self._loaded_at[name] < now]
+                if stale:
+                    self._load(stale)
+        return self._songs, self._categories
+
+    def _load(self, names):
+        versions = read_versions(get_db(), VERSION_NAMES.values())
+        for name in sorted(names, key=lambda n: n != "categories"):
+            fields = CATEGORY_FIELDS if name == "categories" else SONG_FIELDS
+            other = self._tables_by_name["songs" if name == "categories" else "categories"]
+            projection = {"_id": 0, "code": 1, **dict.fromkeys(fields, 1)}
+            try:
+                table = _Table(fields).load(
+                    get_collection(name).find({}, projection),
+                    self.max_bytes - (other.nbytes if other is not None else 0),
+                )
+            except CatalogOverBudget:
+                logger.warning("Catalog %s table exceeds %s bytes, using Mongo lookups", name, self.max_bytes)
+                table = None
+                self._disabled.add(name)
+            else:
+                self._disabled.discard(name)
+
+            self._tables_by_name[name] = table
+            self._versions[name] = versions[VERSION_NAMES[name]]
+            self._loaded_at[name] = time.monotonic()
+            self.loads += 1
+        self._checked_at = time.monotonic()
+
+    def _lookup(self, table, collection, fields, codes):
+        codes = {int(code) for code in codes if code is not None}
+        found = {}
+        missing = []
+        for code in codes:
+            data = table.row(code) if table is not None else None
+            if data is None:
+                missing.append(code)
+            else:
+                found[code] = data
+
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            # Códigos nuevos desde la última carga (o catálogo desactivado)
+            for doc in get_collection(collection).find(
+                {"code": {"$in": missing}},
+                {"_id": 0, "code": 1, **dict.fromkeys(fields, 1)},
+            ):
+                found[int(doc["code"])] = {"code": int(doc["code"]), **{f: doc.get(f) for f in fields}}
+        return found
+
+    def song_table(self):
+        """(tabla de canciones, su versión); la tabla es None si no cabe en memoria."""
+        self._tables()
+        # la versión antes que la tabla: si otro hilo recarga entre medias,
+        # como mucho se ve una versión vieja con datos nuevos
+        version = self._versions["songs"]
+        return self._songs, version
+
+    def songs(self, codes):
+        """{code: {code, name, artist, artwork}} de los codes que existan."""
+        songs, _ = self._tables()
+        return self._lookup(songs, "songs", SONG_FIELDS, codes)
+
+    def categories(self, codes):
+        _, categories = self._tables()
+        return self._lookup(categories, "categories", CATEGORY_FIELDS, codes)
+
+    def category(self, code):
+        return self.categories([code]).get(int(code))
+
+    def all_categories(self):
+        _, categories = self._tables()
+        if categories is not None:
+            self.hits += len(categories.rows)
+            return categories.all()
+
+        self.misses += 1
+        return [
+            {"code": int(doc["code"]), **{f: doc.get(f) for f in CATEGORY_FIELDS}}
+            for doc in get_collection("categories")
+            .find({"code": {"$ne": None}}, {"_id": 0, "code": 1, **dict.fromkeys(CATEGORY_FIELDS, 1)})
+            .sort("code", 1)
+        ]
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "version": dict(self._versions),
+            "songs": len(self._songs.rows) if self._songs is not None else 0,
+            "categories": len(self._categories.rows) if self._categories is not None else 0,
+            "bytes": sum(t.nbytes for t in (self._songs, self._categories) if t is not None),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                config = {**DEFAULT_CATALOG, **getattr(settings, "CATALOG", {})}
+                _catalog = Catalog(config["MAX_BYTES"], config["CHECK_SECONDS"], config["REFRESH_SECONDS"])
+    return _catalog
+
+
+def invalidate_catalog(songs=True, categories=True):
+    """Para después de escribir en songs/categories: avisa a todos los workers.
+
+    songs=False si no han cambiado los datos de ninguna canción (solo las
+    categorías o sus listas de canciones).
+    """
+    names = [name for name, changed in (("songs", songs), ("categories", categories)) if changed]
+    for name in names:
+        bump_version(get_db(), VERSION_NAMES[name])
+    get_catalog().invalidate(names)
+
+
+def with_song_fields(rows, key="code"):
+    """Añade name/artist/artwork a filas que solo traen el code de la canción."""
+    songs = get_catalog().songs(row.get(key) for row in rows)
+    for row in rows:
+        code = row.get(key)
+        song = songs.get(int(code)) if code is not None else None
+        row["name"] = (song or {}).get("name") or f"Song #{code}"
+        row["artist"] = (song or {}).get("artist") or ""
+        row["artwork"] = (song or {}).get("artwork") or ""
+    return rows
+
+
+def with_category_fields(rows, key="code"):
+    categories = get_catalog().categories(row.get(key) for row in rows)
+    for row in rows:
+        code = row.get(key)
+        category = categories.get(int(code)) if code is not None else None
+        row["name"] = (category or {}).get("name") or f"Category #{code}"
+        row["logo"] = (category or {}).get("logo") or ""
+    return rows
@@ -0,0 +1,82 @@
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+
+from songReviews.catalog import get_catalog, invalidate_catalog
+from songReviews.mongo_pool import get_collection
+
+# Canciones de cada categoría (go_ranking, category_songs).
+# De Mongo solo se leen los codes (los datos salen de catalog.py) y la lista
+# se cachea por categoría. La clave lleva el songsVersion de la categoría,
+# que se incrementa cada vez que cambia su lista de canciones
+# (bump_category_versions), así que al cambiar la versión las entradas viejas
+# dejan de usarse y caducan por TTL.
+#
+# Lo que cambia canciones sin pasar por aquí (ediciones sueltas) se ve como
+# mucho TTL segundos tarde. El importador CSV sí sube la versión tanto de las
+# categorías nuevas de cada canción como de las que tenía antes.
+
+DEFAULT_CATEGORY_CACHE = {
+    "ALIAS": "default",
+    "TTL": 300,
+}
+
+KEY_PREFIX = "category_songs:"
+
+
+def _config():
+    return {**DEFAULT_CATEGORY_CACHE, **getattr(settings, "CATEGORY_CACHE", {})}
+
+
+def get_category(code):
+    return get_catalog().category(code)
+
+
+def bump_category_versions(codes):
+    """También avisa al catálogo, pero solo a la tabla de categorías (songsVersion va en ella)."""
+    codes = sorted({int(code) for code in codes})
+    if codes:
+        get_collection("categories").update_many({"code": {"$in": codes}}, {"$inc": {"songsVersion": 1}})
+        invalidate_catalog(songs=False)
+
+
+def fetch_category_songs(code):
+    # De Mongo solo los codes; los datos de cada canción salen del catálogo
+    codes = [
+        int(doc["code"])
+        for doc in get_collection("songs").find({"categories": int(code)}, {"_id": 0, "code": 1}).sort("code", 1)
+    ]
+    songs = get_catalog().songs(codes)
+    return [songs[c] for c in codes if c in songs]
+
+
+def category_songs_cached(category):
+    """Lista de {code, name, artist, artwork} de la categoría, ordenada por code."""
+    config = _config()
+    cache = caches[config["ALIAS"]]
+    key = f"{KEY_PREFIX}{int(category['code'])}:{category.get('songsVersion', 0)}"
+
+    songs = cache.get(key)
+    if songs is None:
+        songs = fetch_category_songs(category["code"])
+        cache.set(key, songs, config["TTL"])
+    return songs
+
+
+def category_etag(category):
+    return f'"{int(category["code"])}-{category.get("songsVersion", 0)}"'
+
+
+def category_songs_json(category):
+    """El JSON de category_songs ya serializado (también cacheado por versión)."""
+    config = _config()
+    cache = caches[config["ALIAS"]]
+    key = f"{KEY_PREFIX}{int(category['code'])}:{category.get('songsVersion', 0)}:json"
+
+    body = cache.get(key)
+    if body is None:
+        songs = category_songs_cached(category)
+        body = json.dumps({"songs": songs}, ensure_ascii=False, separators=(",", ":")).encode()
+        cache.set(key, body, config["TTL"])
+    return body
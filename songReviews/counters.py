@@ -0,0 +1,79 @@
+import threading
+
+from pymongo import DESCENDING, ReturnDocument
+
+# Secuencias atómicas para los code de songs y categories (colección counters).
+# Sustituye al "máximo actual + 1", que da códigos repetidos con escritores
+# concurrentes. Solo usa pymongo para poder usarse también desde los scripts
+# (populate_musicbrainz) sin Django.
+#
+#   {_id: "songs", seq: <último code entregado>}
+
+COUNTERS_COLLECTION = "counters"
+
+# contador -> (colección, campo) de la que se toma el valor inicial
+COUNTER_SOURCES = {
+    "songs": ("songs", "code"),
+    "categories": ("categories", "code"),
+}
+
+_seeded = set()
+_lock = threading.Lock()
+
+
+def _seed(db, name):
+    """Deja el contador como mínimo en el code más alto que ya exista ($max es idempotente)."""
+    key = (db.name, name)
+    if key in _seeded:
+        return
+
+    collection, field = COUNTER_SOURCES[name]
+    last = db[collection].find_one(
+        {field: {"$type": "number"}},
+        sort=[(field, DESCENDING)],
+        projection={field: 1},
+    )
+    bump_counter(db, name, int(last[field]) if last else 0)
+    with _lock:
+        _seeded.add(key)
+
+
+def allocate_codes(db, name, count=1):
+    """Reserva count códigos consecutivos en una sola operación y los devuelve como range."""
+    if count <= 0:
+        return range(0)
+    _seed(db, name)
+
+    doc = db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": name},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    end = int(doc["seq"])
+    return range(end - count + 1, end + 1)
+
+
+def allocate_code(db, name):
+    return allocate_codes(db, name, 1)[0]
+
+
+def bump_counter(db, name, value):
+    """Para cuando alguien escribe codes explícitos (p.ej. un CSV con su columna code)."""
+    db[COUNTERS_COLLECTION].update_one({"_id": name}, {"$max": {"seq": int(value)}}, upsert=True)
+
+
+def bump_version(db, name):
+    """Versiones (no codes): solo se incrementan para avisar de que algo ha cambiado."""
+    db[COUNTERS_COLLECTION].update_one({"_id": name}, {"$inc": {"seq": 1}}, upsert=True)
+
+
+def read_version(db, name):
+    doc = db[COUNTERS_COLLECTION].find_one({"_id": name}, {"seq": 1})
+    return int(doc["seq"]) if doc else 0
+
+
+def read_versions(db, names):
+    """Varias versiones en una sola consulta: {name: version}."""
+    found = {doc["_id"]: int(doc["seq"]) for doc in db[COUNTERS_COLLECTION].find({"_id": {"$in": list(names)}})}
+    return {name: found.get(name, 0) for name in names}
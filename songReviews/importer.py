@@ -0,0 +1,230 @@
+import csv
+import io
+import time
+from itertools import islice
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from songReviews.catalog import invalidate_catalog
+from songReviews.categories import bump_category_versions
+from songReviews.counters import allocate_codes, bump_counter
+from songReviews.mongo_pool import get_collection, get_db
+
+# Importador de canciones desde CSV (data_load).
+# Lee el fichero en streaming, valida cada fila y hace upserts por code en
+# bulk_write desordenados de BATCH_SIZE filas. Las filas con code vacío
+# reciben uno nuevo del contador "songs" (un bloque por lote).
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 500
+REQUIRED_COLUMNS = ("code", "name", "artist", "duration", "artwork", "releaseDate")
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self, max_errors=MAX_ERRORS):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @classmethod
+    def resume(cls, data, max_errors=MAX_ERRORS):
+        """Continúa un resultado guardado con as_dict()."""
+        result = cls(max_errors=max_errors)
+        result.rows = data.get("rows", 0)
+        result.inserted = data.get("inserted", 0)
+        result.updated = data.get("updated", 0)
+        result.failed = data.get("failed", 0)
+        result.errors = list(data.get("errors", []))
+        result.started -= data.get("elapsed", 0.0)
+        return result
+
+    def add_error(self, row_number, reason):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "reason": reason})
+
+    @property
+    def errors_truncated(self):
+        return self.failed > len(self.errors)
+
+    @property
+    def rows_per_sec(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else 0.0
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self.started
+        return self
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+            "elapsed": round(self.elapsed, 2),
+            "rows_per_sec": self.rows_per_sec,
+        }
+
+
+def _int(row, field, minimum=None):
+    value = (row.get(field) or "").strip()
+    try:
+        number = int(value)
+    except ValueError:
+        raise RowError(f"{field} is not an integer: {value!r}")
+    if minimum is not None and number < minimum:
+        raise RowError(f"{field} must be >= {minimum}")
+    return number
+
+
+def _text(row, field, max_length, required=True):
+    value = (row.get(field) or "").strip()
+    if required and not value:
+        raise RowError(f"{field} is empty")
+    if len(value) > max_length:
+        raise RowError(f"{field} is longer than {max_length} characters")
+    return value
+
+
+def _categories(row):
+    codes = []
+    for token in (row.get("categories") or "").split(","):
+        token = token.strip()
+        if not token:
+            continue
+        if not token.isdigit():
+            raise RowError(f"categories has a non-integer value: {token!r}")
+        codes.append(int(token))
+    return codes
+
+
+def parse_row(row):
+    """Fila del CSV -> documento de songs. Lanza RowError con el motivo si no vale."""
+    if None in row:
+        raise RowError("too many columns")
+
+    artwork = (row.get("artwork") or "").strip()
+    if artwork and not artwork.startswith(("http://", "https://")):
+        raise RowError("artwork is not an http(s) URL")
+
+    return {
+        "code": _int(row, "code", minimum=1) if (row.get("code") or "").strip() else None,
+        "name": _text(row, "name", 100),
+        "artist": _text(row, "artist", 100),
+        "duration": _int(row, "duration", minimum=0),
+        "artwork": artwork,
+        "releaseDate": _text(row, "releaseDate", 10),
+        "categories": _categories(row),
+    }
+
+
+def _flush(col, batch, result):
+    if not batch:
+        return
+
+    explicit = [doc["code"] for _, doc in batch if doc["code"] is not None]
+    if explicit:
+        # que el contador no vuelva a dar codes que ya vienen en el CSV
+        bump_counter(get_db(), "songs", max(explicit))
+
+    new_docs = [doc for _, doc in batch if doc["code"] is None]
+    for doc, code in zip(new_docs, allocate_codes(get_db(), "songs", len(new_docs))):
+        doc["code"] = code
+
+    # categorías que tenían antes las canciones del lote: si una fila saca
+    # una canción de una categoría, esa categoría también cambia de versión
+    old_docs = col.find({"code": {"$in": [doc["code"] for _, doc in batch]}}, {"_id": 0, "categories": 1})
+    touched = {code for old in old_docs for code in old.get("categories") or []}
+    touched.update(code for _, doc in batch for code in doc["categories"])
+
+    ops = [
+        UpdateOne({"code": doc["code"]}, {"$set": doc}, upsert=True)
+        for _, doc in batch
+    ]
+    try:
+        res = col.bulk_write(ops, ordered=False)
+        result.inserted += res.upserted_count
+        result.updated += res.matched_count
+    except BulkWriteError as e:
+        details = e.details
+        result.inserted += details.get("nUpserted", 0)
+        result.updated += details.get("nMatched", 0)
+        for err in details.get("writeErrors", []):
+            result.add_error(batch[err["index"]][0], err.get("errmsg", "write error"))
+    # versiones de categoría: ver categories.py; la tabla de canciones del
+    # catálogo se recarga una sola vez, al acabar la importación
+    bump_category_versions(touched)
+    batch.clear()
+
+
+def import_songs_csv(binary_file, batch_size=BATCH_SIZE, max_errors=MAX_ERRORS, on_batch=None, result=None):
+    """Importa un CSV de canciones desde un fichero binario abierto.
+
+    on_batch(result) se llama después de cada bulk_write; en ese momento las
+    primeras result.rows filas ya están escritas. Si se pasa un result previo
+    (ImportResult.resume) se saltan esas filas y se sigue contando sobre él.
+    """
+    result = result if result is not None else ImportResult(max_errors=max_errors)
+    skip_rows = result.rows
+    col = get_collection("songs")
+
+    batch = []
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            result.add_error(1, f"missing columns: {', '.join(missing)}")
+            return result.finish()
+
+        codes = set()
+        for row in islice(reader, skip_rows, None):
+            result.rows += 1
+            row_number = reader.line_num
+            try:
+                doc = parse_row(row)
+            except RowError as e:
+                result.add_error(row_number, str(e))
+                continue
+
+            # Mismo code dos veces en un lote: se escribe el lote antes para
+            # que gane la última fila, como haría una importación secuencial
+            if doc["code"] is not None and doc["code"] in codes:
+                _flush(col, batch, result)
+                codes.clear()
+            batch.append((row_number, doc))
+            codes.add(doc["code"])
+
+            if len(batch) >= batch_size:
+                _flush(col, batch, result)
+                codes.clear()
+                if on_batch:
+                    on_batch(result)
+
+        _flush(col, batch, result)
+        if on_batch:
+            on_batch(result)
+    except UnicodeDecodeError as e:
+        _flush(col, batch, result)
+        result.add_error(result.rows + 1, f"file is not valid UTF-8: {e.reason}")
+    except csv.Error as e:
+        _flush(col, batch, result)
+        result.add_error(result.rows + 1, f"malformed CSV: {e}")
+    finally:
+        text.detach()
+        if result.inserted or result.updated:
+            invalidate_catalog(categories=False)
+
+    return result.finish()
@@ -0,0 +1,100 @@
+from pymongo import ASCENDING as ASC, DESCENDING as DESC, TEXT, IndexModel
+
+from songReviews.models import Category, Ranking, Review, Song
+from songReviews.jobs import JOB_INDEXES, JOBS_COLLECTION
+from songReviews.ratings import SUMMARY_COLLECTION, SUMMARY_INDEXES
+from songReviews.reviews import REVIEW_INDEXES
+from songReviews.stats_snapshot import SNAPSHOT_COLLECTION, SNAPSHOT_INDEXES
+
+# Índices Mongo que la app necesita. Los modelos Mongo son managed = False y el
+# router no migra, así que esta es la única fuente de verdad.
+# Se aplican con: python manage.py ensure_mongo_indexes [--check] [--drop-extra]
+
+MONGO_INDEXES = {
+    Song: [
+        IndexModel([("code", ASC)], name="code_unique", unique=True),
+        IndexModel([("categories", ASC), ("code", ASC)], name="categories_code"),
+        # Clave natural de populate_musicbrainz (TRACK_KEY_INDEX)
+        IndexModel(
+            [("name", ASC), ("artist", ASC), ("release_mbid", ASC)],
+            name="track_natural_key",
+            unique=True,
+            partialFilterExpression={"release_mbid": {"$exists": True}},
+        ),
+        # Para MongoTextSearchBackend (search.py)
+        IndexModel(
+            [("name", TEXT), ("artist", TEXT)],
+            name="name_artist_text",
+            weights={"name": 3, "artist": 2},
+            default_language="none",
+        ),
+    ],
+    Category: [
+        IndexModel([("code", ASC)], name="code_unique", unique=True),
+        IndexModel([("name", ASC)], name="name_unique", unique=True),
+    ],
+    Review: [
+        # add_review hace upsert por (user, songCode)
+        IndexModel([("user", ASC), ("songCode", ASC)], name="user_songCode_unique", unique=True),
+        IndexModel([("reviewDate", DESC)], name="reviewDate_desc"),
+        *REVIEW_INDEXES,
+    ],
+    Ranking: [
+        # Un ranking por usuario y categoría (save_tiers hace upsert; ver migrate_tierlists)
+        IndexModel([("user", ASC), ("categoryCode", ASC)], name="user_categoryCode_unique", unique=True),
+        IndexModel([("rankingDate", DESC)], name="rankingDate_desc"),
+    ],
+    SUMMARY_COLLECTION: SUMMARY_INDEXES,
+    SNAPSHOT_COLLECTION: SNAPSHOT_INDEXES,
+    JOBS_COLLECTION: JOB_INDEXES,
+}
+
+
+def collection_name(target):
+    return target if isinstance(target, str) else target._meta.db_table
+
+
+def _signature(doc):
+    """Lo que define un índice, venga de IndexModel.document o de index_information()."""
+    key = doc["key"]
+    pairs = list(key.items() if hasattr(key, "items") else key)
+    if any(direction == "text" for _, direction in pairs):
+        # Mongo guarda los índices de texto como _fts/_ftsx: se comparan los pesos
+        return ("text", tuple(sorted((doc.get("weights") or {}).items())))
+    keys = tuple(
+        (field, int(direction) if isinstance(direction, (int, float)) else direction)
+        for field, direction in pairs
+    )
+    return (
+        keys,
+        bool(doc.get("unique", False)),
+        bool(doc.get("sparse", False)),
+        doc.get("partialFilterExpression") or None,
+    )
+
+
+def index_plan(db):
+    """Compara lo declarado con lo que hay en la BD.
+
+    Devuelve una lista de (colección, estado, nombre, IndexModel|None) con estado
+    en "ok", "missing", "changed" o "extra".
+    """
+    plan = []
+    for target, models in MONGO_INDEXES.items():
+        name = collection_name(target)
+        existing = db[name].index_information()
+        existing.pop("_id_", None)
+
+        declared = {m.document["name"]: m for m in models}
+        for idx_name, model in declared.items():
+            if idx_name not in existing:
+                plan.append((name, "missing", idx_name, model))
+            elif _signature(existing[idx_name]) != _signature(model.document):
+                plan.append((name, "changed", idx_name, model))
+            else:
+                plan.append((name, "ok", idx_name, model))
+
+        for idx_name in existing:
+            if idx_name not in declared:
+                plan.append((name, "extra", idx_name, None))
+    return plan
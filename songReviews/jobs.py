@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.utils import timezone
+from pymongo import DESCENDING, IndexModel, ReturnDocument
+
+from songReviews.importer import ImportResult, import_songs_csv
+from songReviews.mongo_pool import get_collection
+from songReviews.search import invalidate_search
+
+logger = logging.getLogger(__name__)
+
+# Importaciones de CSV en segundo plano (data_load).
+# El fichero se copia a UPLOAD_DIR, el job se guarda en import_jobs y un pool
+# de hilos del propio worker lo ejecuta. Tras cada lote se guarda el progreso,
+# así un job cancelado o caído se puede reanudar desde el último lote escrito.
+
+JOBS_COLLECTION = "import_jobs"
+JOB_INDEXES = [
+    IndexModel([("createdAt", DESCENDING)], name="createdAt_desc"),
+]
+
+DEFAULT_IMPORT_JOBS = {
+    "WORKERS": 2,
+    "UPLOAD_DIR": None,
+    # un job "running" sin latido en este tiempo se considera caído
+    "STALE_SECONDS": 120,
+}
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+_lock = threading.Lock()
+_executor = None
+_pid = None
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def _config():
+    config = {**DEFAULT_IMPORT_JOBS, **getattr(settings, "IMPORT_JOBS", {})}
+    if config["UPLOAD_DIR"] is None:
+        config["UPLOAD_DIR"] = Path(settings.BASE_DIR) / "uploads"
+    return config
+
+
+def _jobs_col():
+    return get_collection(JOBS_COLLECTION)
+
+
+def _executor_for_process():
+    global _executor, _pid
+    with _lock:
+        if _executor is None or _pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=_config()["WORKERS"], thread_name_prefix="import-job"
+            )
+            _pid = os.getpid()
+    return _executor
+
+
+def _object_id(job_id):
+    try:
+        return ObjectId(job_id)
+    except (InvalidId, TypeError):
+        return None
+
+
+def create_import_job(uploaded_file, user):
+    upload_dir = Path(_config()["UPLOAD_DIR"])
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    path = upload_dir / f"{uuid.uuid4().hex}.csv"
+
+    with open(path, "wb") as out:
+        for chunk in uploaded_file.chunks():
+            out.write(chunk)
+
+    now = timezone.now()
+    job_id = _jobs_col().insert_one({
+        "kind": "songs_csv",
+        "status": QUEUED,
+        "user": user,
+        "filename": uploaded_file.name,
+        "path": str(path),
+        "totalBytes": path.stat().st_size,
+        "bytesDone": 0,
+        "result": None,
+        "error": None,
+        "cancelRequested": False,
+        "createdAt": now,
+        "updatedAt": now,
+        "startedAt": None,
+        "finishedAt": None,
+    }).inserted_id
+
+    _executor_for_process().submit(run_import_job, job_id)
+    return str(job_id)
+
+
+def run_import_job(job_id):
+    col = _jobs_col()
+    now = timezone.now()
+    job = col.find_one_and_update(
+        {"_id": job_id, "status": QUEUED},
+        {"$set": {"status": RUNNING, "startedAt": now, "updatedAt": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if job is None:
+        # cancelado antes de empezar o ya lo ha cogido otro
+        return
+
+    result = ImportResult.resume(job["result"]) if job.get("result") else None
+
+    try:
+        with open(job["path"], "rb") as f:
+            def checkpoint(res):
+                state = col.find_one_and_update(
+                    {"_id": job_id},
+                    {"$set": {
+                        "result": res.finish().as_dict(),
+                        "bytesDone": f.tell(),
+                        "updatedAt": timezone.now(),
+                    }},
+                    projection={"cancelRequested": 1},
+                    return_document=ReturnDocument.AFTER,
+                )
+                if state and state.get("cancelRequested"):
+                    raise ImportCancelled()
+
+            result = import_songs_csv(f, on_batch=checkpoint, result=result)
+
+    except ImportCancelled:
+        col.update_one({"_id": job_id}, {"$set": {
+            "status": CANCELLED, "finishedAt": timezone.now(), "updatedAt": timezone.now(),
+        }})
+        return
+    except Exception as e:
+        logger.exception("Import job %s failed", job_id)
+        col.update_one({"_id": job_id}, {"$set": {
+            "status": FAILED, "error": str(e), "finishedAt": timezone.now(), "updatedAt": timezone.now(),
+        }})
+        return
+
+    col.update_one({"_id": job_id}, {"$set": {
+        "status": DONE,
+        "result": result.as_dict(),
+        "bytesDone": job["totalBytes"],
+        "finishedAt": timezone.now(),
+        "updatedAt": timezone.now(),
+    }})
+    Path(job["path"]).unlink(missing_ok=True)
+
+    if result.inserted or result.updated:
+        invalidate_search()
+
+
+def cancel_job(job_id):
+    oid = _object_id(job_id)
+    if oid is None:
+        return False
+    col = _jobs_col()
+    now = timezone.now()
+
+    res = col.update_one(
+        {"_id": oid, "status": QUEUED},
+        {"$set": {"status": CANCELLED, "finishedAt": now, "updatedAt": now}},
+    )
+    if res.modified_count:
+        return True
+    # En marcha: el hilo lo ve en el siguiente lote
+    res = col.update_one({"_id": oid, "status": RUNNING}, {"$set": {"cancelRequested": True}})
+    return bool(res.modified_count)
+
+
+def _stale_before():
+    return timezone.now() - timedelta(seconds=_config()["STALE_SECONDS"])
+
+
+def is_resumable(job):
+    """Fallido, cancelado o "running" sin latido desde hace STALE_SECONDS (worker caído)."""
+    if job["status"] in (FAILED, CANCELLED):
+        return True
+    updated = job.get("updatedAt")
+    if job["status"] != RUNNING or updated is None:
+        return False
+    if timezone.is_naive(updated):
+        updated = timezone.make_aware(updated, dt_timezone.utc)
+    return updated < _stale_before()
+
+
+def resume_job(job_id):
+    oid = _object_id(job_id)
+    if oid is None:
+        return False
+
+    stale = _stale_before()
+    job = _jobs_col().find_one_and_update(
+        {"_id": oid, "$or": [
+            {"status": {"$in": [FAILED, CANCELLED]}},
+            {"status": RUNNING, "updatedAt": {"$lt": stale}},
+        ]},
+        {"$set": {"status": QUEUED, "cancelRequested": False, "error": None, "finishedAt": None}},
+    )
+    if job is None or not Path(job["path"]).exists():
+        return False
+
+    _executor_for_process().submit(run_import_job, oid)
+    return True
+
+
+def job_to_json(job):
+    result = job.get("result") or ImportResult().as_dict()
+    total = job.get("totalBytes") or 0
+    done = job.get("bytesDone") or 0
+
+    eta = None
+    if job["status"] == RUNNING and 0 < done < total and result.get("elapsed"):
+        eta = round(result["elapsed"] * (total - done) / done, 1)
+
+    return {
+        "id": str(job["_id"]),
+        "status": job["status"],
+        "filename": job.get("filename", ""),
+        "error": job.get("error"),
+        "progress": round(100 * done / total, 1) if total else 0,
+        "eta": eta,
+        "cancelRequested": job.get("cancelRequested", False),
+        "resumable": is_resumable(job),
+        "result": result,
+    }
+
+
+def get_job(job_id):
+    oid = _object_id(job_id)
+    return _jobs_col().find_one({"_id": oid}) if oid else None
+
+
+def recent_jobs(limit=10):
+    return [
+        job_to_json(job)
+        for job in _jobs_col().find({}, {"result.errors": 0}).sort("createdAt", DESCENDING).limit(limit)
+    ]
@@ -0,0 +1,270 @@
+import json
+import math
+import random
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from pymongo import monitoring
+
+from songReviews.metrics import current_request_stats
+from songReviews.models import User
+from songReviews.mongo_pool import close_client, get_collection
+from songReviews.synthetic import BENCH_DB_SUFFIX, WORDS, Zipf, bench_db_name, is_bench_db
+from songReviews.tierlists import TIERS
+
+# Recorre las vistas con el test client de Django contra la base de datos
+# sintética (seed_synthetic) y mide latencia, comandos Mongo y bytes.
+#
+#   MONGO_DB_NAME=songreviews_bench python manage.py bench --json bench.json
+#   MONGO_DB_NAME=songreviews_bench python manage.py bench --compare bench.json
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Con requests_only cuenta solo los comandos de la petición en curso (los de
+    hilos en segundo plano, como el explain de slow_ops o un job de importación, no)."""
+
+    def __init__(self, requests_only=True):
+        self.count = 0
+        self.requests_only = requests_only
+
+    def started(self, event):
+        if not self.requests_only or current_request_stats() is not None:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class Requests:
+    """Genera las peticiones de cada escenario (deterministas con la semilla)."""
+
+    def __init__(self, rng, skew):
+        self.rng = rng
+        songs = [doc["code"] for doc in get_collection("songs").find({}, {"_id": 0, "code": 1}).limit(50_000)]
+        categories = [doc["code"] for doc in get_collection("categories").find({}, {"_id": 0, "code": 1})]
+        if not songs or not categories:
+            raise CommandError("No songs or categories: run seed_synthetic first.")
+
+        self.songs = songs
+        self.categories = categories
+        self._pick_song = Zipf(len(songs), skew, rng)
+        self._pick_category = Zipf(len(categories), skew, rng)
+        self._members = {}
+
+    def song(self):
+        return self.songs[self._pick_song()]
+
+    def category(self):
+        return self.categories[self._pick_category()]
+
+    def members(self, category):
+        if category not in self._members:
+            self._members[category] = [
+                doc["code"]
+                for doc in get_collection("songs").find({"categories": category}, {"_id": 0, "code": 1}).limit(200)
+            ]
+        return self._members[category]
+
+    def tier_data(self, category):
+        songs = self.members(category)
+        tiers = {tier: [] for tier in TIERS}
+        for song in self.rng.sample(songs, min(len(songs), 20)):
+            tiers[self.rng.choice(TIERS)].append(song)
+        return tiers
+
+    def moves(self, category):
+        songs = self.members(category) or [self.song()]
+        return [
+            {"song": self.rng.choice(songs), "tier": self.rng.choice(TIERS + (None,)), "index": 0}
+            for _ in range(self.rng.randint(1, 5))
+        ]
+
+
+# nombre -> (cliente, función que devuelve (método, url, kwargs))
+SCENARIOS = {
+    "show_songs": ("user", lambda r: ("get", reverse("show_songs"), {})),
+    "search_songs": ("user", lambda r: ("get", reverse("show_songs"), {"data": {"q": r.rng.choice(WORDS)}})),
+    "songs_page": ("user", lambda r: ("get", reverse("songs_page"), {})),
+    "view_song": ("user", lambda r: ("get", reverse("view_song", args=[r.song()]), {})),
+    "go_ranking": ("user", lambda r: ("get", reverse("go_ranking", args=[r.category()]), {})),
+    "save_tierlist": ("user", lambda r: _save_tierlist(r)),
+    "move_tierlist_songs": ("user", lambda r: _move_tierlist_songs(r)),
+    "show_categories": ("user", lambda r: ("get", reverse("show_categories"), {})),
+    "stats": ("user", lambda r: ("get", reverse("stats"), {})),
+    "users_panel": ("admin", lambda r: ("get", reverse("users_panel"), {})),
+    "category_songs": ("admin", lambda r: ("get", reverse("category_songs", args=[r.category()]), {})),
+}
+
+
+def _save_tierlist(r):
+    category = r.category()
+    return "post", reverse("save_tierlist"), {"data": {
+        "category_code": category,
+        "tier_data": json.dumps(r.tier_data(category)),
+    }}
+
+
+def _move_tierlist_songs(r):
+    category = r.category()
+    return "post", reverse("move_tierlist_songs", args=[category]), {
+        "data": json.dumps({"ops": r.moves(category)}),
+        "content_type": "application/json",
+    }
+
+
+def percentile(sorted_values, p):
+    """Percentil por rango más cercano."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def body_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Mide las vistas principales contra la base de datos sintética (p50/p95/p99, comandos Mongo, bytes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--skew", type=float, default=1.1)
+        parser.add_argument("--only", action="append", choices=sorted(SCENARIOS), help="Escenario (repetible).")
+        parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este fichero.")
+        parser.add_argument("--compare", help="Resultados JSON de otra ejecución con los que comparar.")
+
+    def handle(self, *args, **options):
+        if not is_bench_db():
+            # save_tierlist y la API de movimientos escriben
+            raise CommandError(
+                f"Refusing to benchmark '{bench_db_name()}': the database name must end with '{BENCH_DB_SUFFIX}'."
+            )
+
+        # El listener tiene que estar antes de crear los clientes Mongo
+        counter = CommandCounter()
+        monitoring.register(counter)
+        close_client()
+        connections["mongodb"].close()
+
+        # Como el runner de tests: testserver en ALLOWED_HOSTS y DEBUG=False
+        setup_test_environment(debug=False)
+        # Los explain de slow_ops vuelven a lanzar las consultas lentas y meten ruido en la latencia
+        override_settings(SLOW_OPS={**getattr(settings, "SLOW_OPS", {}), "ENABLED": False}).enable()
+
+        clients = {"user": Client(), "admin": Client()}
+        clients["user"].force_login(self._user("bench-user", "client"))
+        clients["admin"].force_login(self._user("bench-admin", "admin"))
+
+        requests = Requests(random.Random(options["seed"]), options["skew"])
+        names = options["only"] or list(SCENARIOS)
+
+        results = {}
+        for name in names:
+            results[name] = self._run(name, clients, requests, counter, options["iterations"], options["warmup"])
+            self._print(name, results[name])
+
+        report = {
+            "revision": git_revision(),
+            "date": timezone.now().isoformat(),
+            "database": bench_db_name(),
+            "sizes": {
+                collection: get_collection(collection).estimated_document_count()
+                for collection in ("songs", "categories", "reviews", "ranking")
+            },
+            "options": {key: options[key] for key in ("iterations", "warmup", "seed", "skew")},
+            "results": results,
+        }
+
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['json_path']}")
+
+        if options["compare"]:
+            self._compare(options["compare"], results)
+
+    def _user(self, username, role):
+        user, _ = User.objects.get_or_create(
+            username=username,
+            defaults={"mail": f"{username}@example.com", "role": role},
+        )
+        return user
+
+    def _run(self, name, clients, requests, counter, iterations, warmup):
+        client_name, build = SCENARIOS[name]
+        client = clients[client_name]
+
+        latencies, commands, sizes, statuses = [], [], [], {}
+        for i in range(warmup + iterations):
+            method, url, kwargs = build(requests)
+            counter.count = 0
+            started = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            size = body_size(response)
+            elapsed = (time.perf_counter() - started) * 1000
+
+            if i < warmup:
+                continue
+            latencies.append(elapsed)
+            commands.append(counter.count)
+            sizes.append(size)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "mongo_commands": round(sum(commands) / len(commands), 2),
+            "bytes": round(sum(sizes) / len(sizes)),
+            "status": statuses,
+        }
+
+    def _print(self, name, r):
+        self.stdout.write(
+            f"{name:22} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  p99 {r['p99_ms']:9.2f} ms  "
+            f"mongo {r['mongo_commands']:6.1f}  bytes {r['bytes']:9}  {r['status']}"
+        )
+
+    def _compare(self, path, results):
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)
+        self.stdout.write(f"\nCompared with {path} (revision {previous.get('revision')}):")
+
+        for name, r in results.items():
+            old = previous.get("results", {}).get(name)
+            if not old:
+                continue
+            deltas = []
+            for key in ("p50_ms", "p95_ms", "p99_ms", "mongo_commands", "bytes"):
+                if old[key]:
+                    deltas.append(f"{key} {(r[key] - old[key]) / old[key] * 100:+.1f}%")
+            self.stdout.write(f"{name:22} " + "  ".join(deltas))
@@ -0,0 +1,99 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+from pymongo import monitoring
+
+from songReviews.management.commands.bench import CommandCounter, git_revision, percentile
+from songReviews.mongo_pool import close_client, get_collection
+from songReviews.stats_snapshot import FACET_TO_ROWS, LIVE_FACET_PIPELINE, live_stats_separate
+from songReviews.synthetic import bench_db_name
+
+# Compara las estadísticas de ranking calculadas con las cuatro pasadas
+# separadas (count_documents, placements, canciones, categorías) y con el
+# $facet de una sola pasada. Solo lee; pensado para la base de datos
+# sintética de seed_synthetic:
+#
+#   MONGO_DB_NAME=songreviews_bench python manage.py bench_ranking_stats --json stats.json
+
+
+def _facet():
+    return list(get_collection("ranking").aggregate(LIVE_FACET_PIPELINE + FACET_TO_ROWS, allowDiskUse=True))
+
+
+VARIANTS = {
+    "separate": live_stats_separate,
+    "facet": _facet,
+}
+
+
+def _key(row):
+    return row["kind"], row["code"]
+
+
+class Command(BaseCommand):
+    help = "Mide las estadísticas de ranking: cuatro pipelines separados frente a un único $facet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este fichero.")
+
+    def handle(self, *args, **options):
+        # Fuera de una petición: cuenta todo (con SLOW_OPS apagado para que no se cuelen sus explain)
+        counter = CommandCounter(requests_only=False)
+        override_settings(SLOW_OPS={**getattr(settings, "SLOW_OPS", {}), "ENABLED": False}).enable()
+        monitoring.register(counter)
+        close_client()
+
+        rows = {name: sorted(run(), key=_key) for name, run in VARIANTS.items()}
+        if rows["separate"] != rows["facet"]:
+            raise CommandError("The facet pipeline does not match the separate pipelines.")
+
+        results = {}
+        for name, run in VARIANTS.items():
+            latencies, commands = [], []
+            for i in range(options["warmup"] + options["iterations"]):
+                counter.count = 0
+                started = time.perf_counter()
+                run()
+                elapsed = (time.perf_counter() - started) * 1000
+                if i >= options["warmup"]:
+                    latencies.append(elapsed)
+                    commands.append(counter.count)
+
+            latencies.sort()
+            results[name] = {
+                "runs": len(latencies),
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p95_ms": round(percentile(latencies, 95), 3),
+                "mean_ms": round(sum(latencies) / len(latencies), 3),
+                "mongo_commands": round(sum(commands) / len(commands), 2),
+            }
+            r = results[name]
+            self.stdout.write(
+                f"{name:10} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  mongo {r['mongo_commands']:5.1f}"
+            )
+
+        if results["facet"]["p50_ms"]:
+            speedup = results["separate"]["p50_ms"] / results["facet"]["p50_ms"]
+            self.stdout.write(f"facet p50 speedup: x{speedup:.2f} ({len(rows['facet'])} rows)")
+
+        if options["json_path"]:
+            report = {
+                "revision": git_revision(),
+                "date": timezone.now().isoformat(),
+                "database": bench_db_name(),
+                "sizes": {
+                    collection: get_collection(collection).estimated_document_count()
+                    for collection in ("songs", "categories", "ranking")
+                },
+                "options": {key: options[key] for key in ("iterations", "warmup")},
+                "results": results,
+            }
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['json_path']}")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from songReviews.stats_snapshot import check_snapshot
+
+
+class Command(BaseCommand):
+    help = "Compara stats_snapshot con los pipelines sobre ranking y lista las diferencias."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=50, help="Máximo de diferencias a mostrar.")
+
+    def handle(self, *args, **options):
+        mismatches = check_snapshot()
+
+        for kind, code, field, actual, expected in mismatches[:options["limit"]]:
+            self.stdout.write(f"{kind} #{code} {field}: snapshot={actual} real={expected}")
+
+        if mismatches:
+            raise CommandError(
+                f"{len(mismatches)} mismatch(es). Run 'manage.py rebuild_stats_snapshot' to fix."
+            )
+        self.stdout.write(self.style.SUCCESS("Stats snapshot is consistent."))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import OperationFailure
+
+from songReviews.indexes import index_plan
+from songReviews.mongo_pool import get_db
+
+
+class Command(BaseCommand):
+    help = "Crea los índices Mongo declarados en songReviews/indexes.py y detecta drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="No toca nada; sale con error si falta o ha cambiado algún índice.",
+        )
+        parser.add_argument(
+            "--drop-extra", action="store_true",
+            help="Borra índices no declarados y recrea los que han cambiado.",
+        )
+
+    def handle(self, *args, **options):
+        db = get_db()
+        plan = index_plan(db)
+
+        drift = [p for p in plan if p[1] in ("missing", "changed")]
+        extra = [p for p in plan if p[1] == "extra"]
+
+        for collection, state, name, _ in plan:
+            style = self.style.SUCCESS if state == "ok" else self.style.WARNING
+            self.stdout.write(style(f"{state:8} {collection}.{name}"))
+
+        if options["check"]:
+            if drift:
+                raise CommandError(f"{len(drift)} index(es) missing or changed.")
+            self.stdout.write(self.style.SUCCESS(f"Indexes OK ({len(extra)} extra)."))
+            return
+
+        failed = []
+        for collection, state, name, model in drift + extra:
+            col = db[collection]
+            try:
+                if state == "missing":
+                    col.create_indexes([model], background=True)
+                    self.stdout.write(f"created  {collection}.{name}")
+                elif not options["drop_extra"]:
+                    self.stdout.write(self.style.WARNING(
+                        f"skipped  {collection}.{name} ({state}, use --drop-extra)"
+                    ))
+                elif state == "changed":
+                    col.drop_index(name)
+                    col.create_indexes([model], background=True)
+                    self.stdout.write(f"rebuilt  {collection}.{name}")
+                else:
+                    col.drop_index(name)
+                    self.stdout.write(f"dropped  {collection}.{name}")
+            except OperationFailure as e:
+                # p.ej. índice único sobre codes duplicados: manage.py repair_song_codes
+                failed.append(f"{collection}.{name}")
+                self.stderr.write(self.style.ERROR(f"failed   {collection}.{name}: {e}"))
+
+        if failed:
+            raise CommandError(f"Could not build: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from pymongo import DeleteMany, UpdateOne
+
+from songReviews.mongo_pool import get_db
+from songReviews.stats_snapshot import rebuild_snapshot
+from songReviews.tierlists import tiers_of
+from songReviews.utils import batched
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa los rankings al formato compacto (tiers + version), dejando uno "
+        "por usuario y categoría (el más reciente)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta, no escribe nada.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        db = get_db()
+        dry_run = options["dry_run"]
+        batch_size = options["batch_size"]
+
+        # 1) Duplicados por (user, categoryCode): se queda el de rankingDate más reciente
+        duplicates = db["ranking"].aggregate([
+            {"$sort": {"rankingDate": -1, "_id": -1}},
+            {"$group": {"_id": {"user": "$user", "categoryCode": "$categoryCode"},
+                        "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+            {"$match": {"n": {"$gt": 1}}},
+            {"$project": {"stale": {"$slice": ["$ids", 1, {"$subtract": ["$n", 1]}]}}},
+        ], allowDiskUse=True)
+
+        removed = 0
+        for chunk in batched(duplicates, batch_size):
+            stale = [oid for group in chunk for oid in group["stale"]]
+            removed += len(stale)
+            if not dry_run:
+                db["ranking"].bulk_write([DeleteMany({"_id": {"$in": stale}})])
+
+        # 2) rankList -> tiers
+        converted = 0
+        legacy = db["ranking"].find({"tiers": {"$exists": False}}, {"rankList": 1, "version": 1})
+        for chunk in batched(legacy, batch_size):
+            converted += len(chunk)
+            if dry_run:
+                continue
+            db["ranking"].bulk_write([
+                UpdateOne(
+                    {"_id": doc["_id"], "tiers": {"$exists": False}},
+                    {
+                        "$set": {"tiers": tiers_of(doc), "version": doc.get("version") or 1},
+                        "$unset": {"rankList": ""},
+                    },
+                )
+                for doc in chunk
+            ], ordered=False)
+
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(f"{prefix}{removed} duplicated rankings removed, {converted} converted.")
+
+        if not dry_run and (removed or converted):
+            rebuild_snapshot()
+            self.stdout.write("Stats snapshot rebuilt.")
+        if not dry_run:
+            self.stdout.write(
+                "Run `manage.py ensure_mongo_indexes --drop-extra` to build the unique (user, categoryCode) index."
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from songReviews.ratings import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Recalcula song_rating_summary (count, sum, histograma) a partir de reviews."
+
+    def handle(self, *args, **options):
+        total = rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} song rating summaries."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from songReviews.stats_snapshot import rebuild_snapshot
+
+
+class Command(BaseCommand):
+    help = "Recalcula stats_snapshot a partir de la colección ranking."
+
+    def handle(self, *args, **options):
+        total = rebuild_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats snapshot ({total} entries)."))
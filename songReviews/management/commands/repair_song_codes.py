@@ -0,0 +1,117 @@
+from django.core.management.base import BaseCommand
+from pymongo import ASCENDING, UpdateMany, UpdateOne
+
+from songReviews.catalog import invalidate_catalog
+from songReviews.categories import bump_category_versions
+from songReviews.counters import allocate_codes
+from songReviews.mongo_pool import get_db
+from songReviews.stats_snapshot import rebuild_snapshot
+from songReviews.tierlists import TIERS
+from songReviews.utils import batched
+
+
+class Command(BaseCommand):
+    help = (
+        "Reasigna codes de canciones duplicados (se queda el documento más antiguo) "
+        "y corrige las referencias en los rankings (rankList y tiers)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Solo informa de lo que cambiaría.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        db = get_db()
+        dry_run = options["dry_run"]
+        batch_size = options["batch_size"]
+
+        # Solo los codes repetidos; los documentos se leen después por lotes
+        dup_codes = (
+            d["_id"]
+            for d in db["songs"].aggregate([
+                {"$match": {"code": {"$ne": None}}},
+                {"$group": {"_id": "$code", "count": {"$sum": 1}}},
+                {"$match": {"count": {"$gt": 1}}},
+                {"$sort": {"_id": 1}},
+            ], allowDiskUse=True)
+        )
+
+        totals = {"groups": 0, "songs": 0, "placements": 0, "ambiguous_reviews": 0}
+        for codes in batched(dup_codes, batch_size):
+            self._repair_batch(db, codes, dry_run, totals)
+
+        prefix = "[dry-run] would reassign" if dry_run else "Reassigned"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {totals['songs']} song(s) in {totals['groups']} duplicate code(s); "
+            f"{totals['placements']} ranking placement(s) rewritten; "
+            f"{totals['ambiguous_reviews']} review(s) on duplicated codes kept on the original song."
+        ))
+
+        if totals["placements"] and not dry_run:
+            rebuild_snapshot()
+            self.stdout.write("Stats snapshot rebuilt.")
+
+    def _repair_batch(self, db, codes, dry_run, totals):
+        groups = {}
+        for doc in db["songs"].find(
+            {"code": {"$in": codes}},
+            {"_id": 1, "code": 1, "name": 1, "artist": 1, "categories": 1},
+        ).sort([("code", ASCENDING), ("_id", ASCENDING)]):
+            groups.setdefault(doc["code"], []).append(doc)
+
+        moved = [doc for docs in groups.values() for doc in docs[1:]]
+        new_codes = (
+            range(-1, -len(moved) - 1, -1) if dry_run
+            else allocate_codes(db, "songs", len(moved))
+        )
+        new_code_of = {doc["_id"]: code for doc, code in zip(moved, new_codes)}
+
+        song_ops = []
+        ranking_ops = []
+        for old_code, docs in groups.items():
+            keeper, rest = docs[0], docs[1:]
+            totals["groups"] += 1
+            totals["songs"] += len(rest)
+
+            self.stdout.write(f"code {old_code}: keep {keeper['_id']} ({keeper.get('name')} — {keeper.get('artist')})")
+            for doc in rest:
+                new = new_code_of[doc["_id"]]
+                label = "new code" if dry_run else f"-> {new}"
+                self.stdout.write(f"    {doc['_id']} ({doc.get('name')} — {doc.get('artist')}) {label}")
+                song_ops.append(UpdateOne({"_id": doc["_id"], "code": old_code}, {"$set": {"code": new}}))
+
+            # Una posición en un ranking de la categoría C solo puede ser de la
+            # canción de ese code que está en C. Si el original también está en C
+            # (o ninguna lo está) es ambigua y se queda con el original.
+            keeper_cats = set(keeper.get("categories") or [])
+            claimed = set()
+            for doc in rest:
+                for cat in set(doc.get("categories") or []) - keeper_cats - claimed:
+                    claimed.add(cat)
+                    query = {"categoryCode": cat, "rankList.song": old_code}
+                    totals["placements"] += db["ranking"].count_documents(query)
+                    ranking_ops.append(UpdateMany(
+                        query,
+                        {"$set": {"rankList.$[item].song": new_code_of[doc["_id"]]}},
+                        array_filters=[{"item.song": old_code}],
+                    ))
+                    for tier in TIERS:
+                        query = {"categoryCode": cat, f"tiers.{tier}": old_code}
+                        totals["placements"] += db["ranking"].count_documents(query)
+                        ranking_ops.append(UpdateMany(
+                            query,
+                            {"$set": {f"tiers.{tier}.$[item]": new_code_of[doc["_id"]]}},
+                            array_filters=[{"item": old_code}],
+                        ))
+
+            # Las reviews solo guardan songCode: no hay forma de saber de cuál era
+            totals["ambiguous_reviews"] += db["reviews"].count_documents({"songCode": old_code})
+
+        if dry_run:
+            return
+        if song_ops:
+            db["songs"].bulk_write(song_ops, ordered=False)
+            bump_category_versions(cat for doc in moved for cat in doc.get("categories") or [])
+            invalidate_catalog(categories=False)
+        if ranking_ops:
+            db["ranking"].bulk_write(ranking_ops, ordered=False)
@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from songReviews.catalog import invalidate_catalog
+from songReviews.counters import bump_counter
+from songReviews.mongo_pool import get_db
+from songReviews.ratings import rebuild_summaries
+from songReviews.stats_snapshot import rebuild_snapshot
+from songReviews.synthetic import (
+    BENCH_DB_SUFFIX, DEFAULT_SIZES, bench_db_name, generate_categories, generate_reviews, generate_songs,
+    generate_tierlists, is_bench_db,
+)
+from songReviews.utils import batched
+
+SEEDED_COLLECTIONS = ("songs", "categories", "reviews", "ranking", "counters")
+
+
+class Command(BaseCommand):
+    help = (
+        "Llena una base de datos Mongo de pruebas (nombre acabado en _bench) con "
+        "canciones, categorías, reviews y tierlists sintéticas y deterministas."
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_SIZES.items():
+            parser.add_argument(f"--{name}", type=int, default=default)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--skew", type=float, default=1.1, help="Exponente Zipf de popularidad (0 = uniforme).")
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        if not is_bench_db():
+            raise CommandError(
+                f"Refusing to seed '{bench_db_name()}': the database name must end with '{BENCH_DB_SUFFIX}' "
+                f"(e.g. MONGO_DB_NAME=songreviews{BENCH_DB_SUFFIX} python manage.py seed_synthetic)."
+            )
+        if min(options[name] for name in DEFAULT_SIZES) <= 0:
+            raise CommandError("All sizes must be positive.")
+
+        db = get_db()
+        rng = random.Random(options["seed"])
+        skew = options["skew"]
+        batch_size = options["batch_size"]
+
+        for name in SEEDED_COLLECTIONS:
+            db[name].drop()
+
+        members = {}
+
+        def songs():
+            for doc in generate_songs(rng, options["songs"], options["categories"], skew):
+                for category in doc["categories"]:
+                    members.setdefault(category, []).append(doc["code"])
+                yield doc
+
+        steps = [
+            ("categories", lambda: generate_categories(rng, options["categories"])),
+            ("songs", songs),
+            ("reviews", lambda: generate_reviews(rng, options["reviews"], options["users"], options["songs"], skew)),
+            ("ranking", lambda: generate_tierlists(rng, options["tierlists"], options["users"], members, skew)),
+        ]
+        for collection, docs in steps:
+            started = time.monotonic()
+            total = 0
+            for chunk in batched(docs(), batch_size):
+                db[collection].insert_many(chunk, ordered=False)
+                total += len(chunk)
+            self.stdout.write(f"{collection}: {total} documents ({time.monotonic() - started:.1f} s)")
+
+        bump_counter(db, "songs", options["songs"])
+        bump_counter(db, "categories", options["categories"])
+
+        call_command("ensure_mongo_indexes", stdout=self.stdout)
+        self.stdout.write(f"song_rating_summary: {rebuild_summaries()} documents")
+        self.stdout.write(f"stats_snapshot: {rebuild_snapshot()} documents")
+        invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded {bench_db_name()} (seed {options['seed']})."))
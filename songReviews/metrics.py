@@ -0,0 +1,190 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from pymongo import monitoring
+
+from songReviews.catalog import get_catalog
+
+# Métricas por petición: cuántos comandos Mongo lanza cada vista, cuánto
+# tiempo pasa en Mongo, cuál es el comando más lento y cuánto tarda la
+# respuesta. MongoMetricsMiddleware abre un RequestStats por petición y
+# MongoCommandCollector (registrado en apps.py, antes de crear ningún
+# MongoClient) le va sumando los comandos que terminan en ese contexto.
+#
+# Los histogramas son por proceso: con varios workers, Prometheus tiene que
+# leer /metrics de cada uno (o agregarlos fuera).
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+_current = contextvars.ContextVar("mongo_request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("path", "commands", "mongo_seconds", "slowest_command", "slowest_seconds")
+
+    def __init__(self, path=None):
+        self.path = path
+        self.commands = 0
+        self.mongo_seconds = 0.0
+        self.slowest_command = None
+        self.slowest_seconds = 0.0
+
+    def add(self, command_name, seconds):
+        self.commands += 1
+        self.mongo_seconds += seconds
+        if seconds >= self.slowest_seconds:
+            self.slowest_command = command_name
+            self.slowest_seconds = seconds
+
+
+def current_request_stats():
+    """RequestStats de la petición en curso (None fuera de una petición)."""
+    return _current.get()
+
+
+class MongoCommandCollector(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.add(event.command_name, event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}   # valores de labels -> [contadores por bucket..., +Inf], suma
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(label_values, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[i] += 1
+            self._series[label_values] = (counts, total + value)
+
+    def _labels(self, label_values, **extra):
+        pairs = list(zip(self.labels, label_values)) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(label_values, le=bound)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(label_values)} {total}")
+            lines.append(f"{self.name}_count{self._labels(label_values)} {cumulative}")
+        return "\n".join(lines)
+
+
+REQUEST_SECONDS = Histogram(
+    "django_view_duration_seconds", "Response time per view.", DURATION_BUCKETS, ("view",),
+)
+MONGO_COMMANDS = Histogram(
+    "mongo_commands_per_request", "Mongo commands issued per request.", COMMAND_BUCKETS, ("view",),
+)
+MONGO_SECONDS = Histogram(
+    "mongo_time_per_request_seconds", "Total Mongo time per request.", DURATION_BUCKETS, ("view",),
+)
+MONGO_SLOWEST_SECONDS = Histogram(
+    "mongo_slowest_command_seconds", "Slowest Mongo command of each request.", DURATION_BUCKETS,
+    ("view", "command"),
+)
+HISTOGRAMS = (REQUEST_SECONDS, MONGO_COMMANDS, MONGO_SECONDS, MONGO_SLOWEST_SECONDS)
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "<unresolved>"
+
+
+def _server_timing(stats, elapsed):
+    parts = [
+        f'mongo;dur={stats.mongo_seconds * 1000:.1f};desc="{stats.commands} commands"',
+        f"total;dur={elapsed * 1000:.1f}",
+    ]
+    if stats.slowest_command:
+        parts.append(f'mongo-slowest;dur={stats.slowest_seconds * 1000:.1f};desc="{stats.slowest_command}"')
+    return ", ".join(parts)
+
+
+class MongoMetricsMiddleware:
+    # Síncrono y async: con ASGI las vistas async no pasan por un hilo
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        stats = RequestStats(request.path)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats(request.path)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - started)
+
+    def _finish(self, request, response, stats, elapsed):
+        view = _view_name(request)
+        REQUEST_SECONDS.observe(elapsed, view)
+        MONGO_COMMANDS.observe(stats.commands, view)
+        MONGO_SECONDS.observe(stats.mongo_seconds, view)
+        if stats.slowest_command:
+            MONGO_SLOWEST_SECONDS.observe(stats.slowest_seconds, view, stats.slowest_command)
+
+        if settings.DEBUG:
+            response["Server-Timing"] = _server_timing(stats, elapsed)
+        return response
+
+
+def render_metrics():
+    # Contadores del catálogo en memoria (catalog.py)
+    catalog = get_catalog().stats()
+    lines = [histogram.render() for histogram in HISTOGRAMS]
+    for key, kind in (("hits", "counter"), ("misses", "counter"), ("loads", "counter"), ("bytes", "gauge")):
+        name = f"catalog_{key}_total" if kind == "counter" else f"catalog_{key}"
+        lines.append(f"# TYPE {name} {kind}\n{name} {catalog[key]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import threading
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from pymongo import AsyncMongoClient, MongoClient
+
+# Cliente Mongo compartido por todo el proceso (un pool por worker).
+# Se configura desde la entrada "mongodb" de DATABASES: HOST, NAME y OPTIONS
+# (las OPTIONS se pasan tal cual a MongoClient, igual que hace el backend).
+
+DEFAULT_OPTIONS = {
+    "maxPoolSize": 50,
+    "minPoolSize": 0,
+    "maxIdleTimeMS": 60_000,
+    "connectTimeoutMS": 5_000,
+    "serverSelectionTimeoutMS": 5_000,
+    "socketTimeoutMS": 30_000,
+    "waitQueueTimeoutMS": 5_000,
+    "retryWrites": True,
+    "retryReads": True,
+}
+
+_lock = threading.Lock()
+_client = None
+_pid = None
+
+
+def _config():
+    return settings.DATABASES["mongodb"]
+
+
+def get_client():
+    global _client, _pid
+
+    # Tras un fork (gunicorn/uwsgi con preload) el pool heredado no vale:
+    # los sockets son del padre, así que se crea uno nuevo en el hijo.
+    if _client is not None and _pid == os.getpid():
+        return _client
+
+    with _lock:
+        if _client is None or _pid != os.getpid():
+            cfg = _config()
+            options = {**DEFAULT_OPTIONS, **cfg.get("OPTIONS", {})}
+            _client = MongoClient(cfg["HOST"], connect=False, **options)
+            _pid = os.getpid()
+    return _client
+
+
+def get_db():
+    return get_client()[_config()["NAME"]]
+
+
+def get_collection(name):
+    return get_db()[name]
+
+
+def close_client():
+    global _client, _pid
+    with _lock:
+        if _client is not None and _pid == os.getpid():
+            _client.close()
+        _client = None
+        _pid = None
+
+
+# -- Cliente async (vistas async) --
+#
+# Un AsyncMongoClient solo vale en el event loop en el que se usa por primera
+# vez, así que hay uno por loop. Con ASGI (rankingProject/asgi.py, uvicorn o
+# daphne) eso es uno por worker. Con WSGI (runserver, gunicorn, el test
+# client) Django crea un loop por cada petición a una vista async: un cliente
+# por loop sería un cliente nuevo por petición, así que ahí las vistas async
+# usan el cliente síncrono compartido desde un hilo (_ThreadedCollection).
+# asgi.py llama a enable_async_client() al arrancar.
+
+_async_clients = weakref.WeakKeyDictionary()
+_async_enabled = False
+
+
+def enable_async_client():
+    global _async_enabled
+    _async_enabled = True
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        cfg = _config()
+        options = {**DEFAULT_OPTIONS, **cfg.get("OPTIONS", {})}
+        client = _async_clients[loop] = AsyncMongoClient(cfg["HOST"], **options)
+    return client
+
+
+def get_async_db():
+    return get_async_client()[_config()["NAME"]]
+
+
+def get_async_collection(name):
+    if not _async_enabled:
+        return _ThreadedCollection(get_collection(name))
+    return get_async_db()[name]
+
+
+class _ThreadedCursor:
+    """Cursor síncrono con la parte de la interfaz async que usan las vistas."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, limit):
+        self._cursor.limit(limit)
+        return self
+
+    async def to_list(self, length=None):
+        return await sync_to_async(self._cursor.to_list, thread_sensitive=False)(length)
+
+
+class _ThreadedCollection:
+    """Colección del cliente síncrono con la interfaz de AsyncCollection (find, find_one, aggregate)."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return _ThreadedCursor(self._collection.find(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return await sync_to_async(self._collection.find_one, thread_sensitive=False)(*args, **kwargs)
+
+    async def aggregate(self, *args, **kwargs):
+        cursor = await sync_to_async(self._collection.aggregate, thread_sensitive=False)(*args, **kwargs)
+        return _ThreadedCursor(cursor)
+
+
+def _reset_after_fork():
+    # No se cierra: el cliente es del padre. Solo se olvida.
+    global _client, _pid, _lock, _async_clients
+    _lock = threading.Lock()
+    _client = None
+    _pid = None
+    _async_clients = weakref.WeakKeyDictionary()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
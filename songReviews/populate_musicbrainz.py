@@ -1,8 +1,23 @@
+# Uso (desde la raíz del proyecto):
+#   python -m songReviews.populate_musicbrainz [--offline | --refresh]
+
+import argparse
+import asyncio
+import email.utils
+import random
+import sqlite3
+import threading
 import time
+import zlib
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
 import requests
-from pymongo import MongoClient
+from pymongo import ASCENDING, MongoClient, UpdateOne
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from requests.structures import CaseInsensitiveDict
+
+from songReviews.counters import allocate_codes, bump_version
 
 MB_BASE = "https://musicbrainz.org/ws/2"
 CAA_BASE = "https://coverartarchive.org"
@@ -12,55 +27,300 @@ HEADERS = {
     "User-Agent": "songReviews/1.0 (contact: unamamadote50@gmail.com)"
 }
 
-session = requests.Session()
-retries = Retry(
-    total=8,
-    backoff_factor=1.2,
-    status_forcelist=[429, 500, 502, 503, 504],
-    allowed_methods=["GET", "POST"]
+# Límites por host: (peticiones/seg, ráfaga). MusicBrainz pide ~1 req/seg;
+# Cover Art Archive va por separado y en paralelo.
+HOST_LIMITS = {
+    "musicbrainz.org": (1.0, 1),
+    "coverartarchive.org": (4.0, 4),
+}
+DEFAULT_LIMIT = (2.0, 2)
+MAX_ATTEMPTS = 5
+MAX_CONNECTIONS = 10
+
+
+# Caché de respuestas en disco (SQLite, cuerpos comprimidos con zlib)
+CACHE_PATH = Path(__file__).resolve().parent.parent / ".cache" / "musicbrainz.sqlite3"
+DAY = 24 * 3600
+# TTL por endpoint (prefijo host+path); lo que no encaja usa DEFAULT_TTL
+CACHE_TTLS = (
+    ("musicbrainz.org/ws/2/artist", 30 * DAY),
+    ("musicbrainz.org/ws/2/release-group", 1 * DAY),
+    ("musicbrainz.org/ws/2/release", 7 * DAY),
+    ("coverartarchive.org/release/", 7 * DAY),
 )
-session.mount("https://", HTTPAdapter(max_retries=retries))
+DEFAULT_TTL = 1 * DAY
+# 404 también se guarda: "este release no tiene portada" es una respuesta válida
+CACHEABLE_STATUS = (200, 404)
+
+
+class OfflineCacheMiss(RuntimeError):
+    pass
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def key(url, params=None):
+        return f"{url}?{urlencode(sorted((params or {}).items()))}" if params else url
+
+    @staticmethod
+    def ttl(url):
+        target = url.split("://", 1)[-1]
+        for prefix, ttl in CACHE_TTLS:
+            if target.startswith(prefix):
+                return ttl
+        return DEFAULT_TTL
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, body, etag, last_modified, fetched_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, body, etag, last_modified, fetched_at = row
+        return {
+            "status": status,
+            "body": zlib.decompress(body),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+        }
+
+    def put(self, key, response):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.status_code,
+                    zlib.compress(response.content),
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    time.time(),
+                ),
+            )
+            self._db.commit()
+
+    def touch(self, key):
+        # 304: sigue valiendo, se renueva el TTL
+        with self._lock:
+            self._db.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def cached_response(url, entry):
+    r = requests.Response()
+    r.status_code = entry["status"]
+    r._content = entry["body"]
+    r.headers = CaseInsensitiveDict({"Content-Type": "application/json", "X-From-Cache": "1"})
+    r.url = url
+    r.encoding = "utf-8"
+    return r
+
+
+class TokenBucket:
+    """Token bucket por reservas (GCRA): cada acquire reserva su hueco y duerme hasta él.
+
+    No depende del event loop, así que vale para varios asyncio.run() seguidos.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1.0 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self._tat = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        now = time.monotonic()
+        with self._lock:
+            tat = max(self._tat, now)
+            self._tat = tat + self.interval
+            return max(0.0, tat - self.tolerance - now)
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        # Retry-After: nadie usa este host hasta que pase
+        with self._lock:
+            self._tat = max(self._tat, time.monotonic() + seconds + self.tolerance)
+
+
+def retry_after_seconds(response, default):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class FetchEngine:
+    """Cliente HTTP asíncrono con rate limit por host, pool de conexiones y reintentos.
+
+    Las peticiones son de requests (en hilos con asyncio.to_thread); el limitador
+    y la concurrencia los lleva asyncio.
+    """
+
+    def __init__(self, host_limits=None, max_connections=MAX_CONNECTIONS, timeout=30, cache=None, mode="normal"):
+        self.host_limits = {**HOST_LIMITS, **(host_limits or {})}
+        self.timeout = timeout
+        # mode: "normal" (caché + revalidación), "offline" (solo caché), "refresh" (ignora TTL)
+        self.cache = cache
+        self.mode = mode
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=len(self.host_limits) + 1, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def bucket(self, url):
+        host = urlsplit(url).hostname or ""
+        with self._buckets_lock:
+            if host not in self._buckets:
+                rate, burst = self.host_limits.get(host, DEFAULT_LIMIT)
+                self._buckets[host] = TokenBucket(rate, burst)
+            return self._buckets[host]
+
+    async def get(self, url, params=None, timeout=None):
+        """GET con caché y reintentos. Devuelve la Response (también si es 4xx)."""
+        if self.cache is None:
+            return await self._fetch(url, params, timeout)
+
+        key = ResponseCache.key(url, params)
+        entry = self.cache.get(key)
+
+        if self.mode == "offline":
+            if entry is None:
+                raise OfflineCacheMiss(f"Not in cache: {key}")
+            return cached_response(url, entry)
+
+        if entry and self.mode != "refresh" and time.time() - entry["fetched_at"] < ResponseCache.ttl(url):
+            return cached_response(url, entry)
+
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        r = await self._fetch(url, params, timeout, headers=headers)
+        if r.status_code == 304 and entry:
+            self.cache.touch(key)
+            return cached_response(url, entry)
+        if r.status_code in CACHEABLE_STATUS:
+            self.cache.put(key, r)
+        return r
+
+    async def _fetch(self, url, params=None, timeout=None, headers=None):
+        bucket = self.bucket(url)
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            backoff = min(10, 2 ** attempt) + random.uniform(0, 0.5)
+            await bucket.acquire()
+            try:
+                r = await asyncio.to_thread(
+                    self.session.get, url, params=params, headers=headers, timeout=timeout or self.timeout
+                )
+            except requests.exceptions.RequestException as e:
+                print(f"[WARN] Request failed ({attempt}/{MAX_ATTEMPTS}): {e}. Retrying in {backoff:.1f}s...")
+                await asyncio.sleep(backoff)
+                continue
 
-def mb_get(url, params=None):
-    for attempt in range(1, 6):
-        try:
-            r = session.get(url, params=params, headers=HEADERS, timeout=30)
-            # rate limit friendly (MusicBrainz recomienda ~1 req/seg)
-            time.sleep(1.1)
-            r.raise_for_status()
-            return r.json()
+            if r.status_code in (429, 503):
+                wait = retry_after_seconds(r, backoff)
+                print(f"[WARN] {r.status_code} from {urlsplit(url).hostname} ({attempt}/{MAX_ATTEMPTS}). Waiting {wait:.1f}s...")
+                bucket.pause(wait)
+                continue
+            if r.status_code >= 500:
+                print(f"[WARN] {r.status_code} from {urlsplit(url).hostname} ({attempt}/{MAX_ATTEMPTS}). Retrying in {backoff:.1f}s...")
+                await asyncio.sleep(backoff)
+                continue
+            return r
 
-        except requests.exceptions.RequestException as e:
-            # Espera creciente y reintenta
-            wait = min(10, 2 ** attempt)
-            print(f"[WARN] Request failed ({attempt}/5): {e}. Retrying in {wait}s...")
-            time.sleep(wait)
+        raise RuntimeError(f"Request failed after retries: {url}")
 
-    raise RuntimeError("MusicBrainz request failed after retries.")
+    async def get_json(self, url, params=None):
+        r = await self.get(url, params=params)
+        r.raise_for_status()
+        return r.json()
 
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
 
-def caa_front_image_url(release_mbid: str) -> str | None:
-    """Devuelve la URL de la portada frontal si existe."""
+
+engine = FetchEngine()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+# -- API ASÍNCRONA --
+
+async def mb_get_async(url, params=None):
+    return await engine.get_json(url, params=params)
+
+
+async def caa_front_image_url_async(release_mbid: str) -> str | None:
     try:
-        r = requests.get(f"{CAA_BASE}/release/{release_mbid}", headers=HEADERS, timeout=20)
-        time.sleep(0.5)
+        r = await engine.get(f"{CAA_BASE}/release/{release_mbid}", timeout=20)
         if r.status_code != 200:
             return None
         data = r.json()
-        images = data.get("images", [])
-        # Busca front primero
-        for img in images:
-            if img.get("front") and "image" in img:
-                return img["image"]
-        # Si no hay front, cualquier image
-        if images and "image" in images[0]:
-            return images[0]["image"]
-        return None
+    except OfflineCacheMiss:
+        raise
     except Exception:
         return None
 
-def find_artist_mbid(artist_name: str) -> str | None:
-    data = mb_get(f"{MB_BASE}/artist", params={
+    images = data.get("images", [])
+    # Busca front primero
+    for img in images:
+        if img.get("front") and "image" in img:
+            return img["image"]
+    # Si no hay front, cualquier image
+    if images and "image" in images[0]:
+        return images[0]["image"]
+    return None
+
+
+async def find_artist_mbid_async(artist_name: str) -> str | None:
+    data = await mb_get_async(f"{MB_BASE}/artist", params={
         "query": f'artist:"{artist_name}"',
         "fmt": "json",
         "limit": 1
@@ -70,9 +330,9 @@ def find_artist_mbid(artist_name: str) -> str | None:
         return None
     return artists[0]["id"]
 
-def get_release_groups(artist_mbid: str, group_types=("album", "single", "ep"), limit=10):
+async def get_release_groups_async(artist_mbid: str, group_types=("album", "single", "ep"), limit=10):
     # Trae release-groups del artista
-    data = mb_get(f"{MB_BASE}/release-group", params={
+    data = await mb_get_async(f"{MB_BASE}/release-group", params={
         "artist": artist_mbid,
         "fmt": "json",
         "limit": limit,
@@ -80,27 +340,29 @@ def get_release_groups(artist_mbid: str, group_types=("album", "single", "ep"),
     })
     return data.get("release-groups", [])
 
-def pick_release_with_cover(release_group_mbid: str) -> dict | None:
-    data = mb_get(f"{MB_BASE}/release", params={
+async def pick_release_with_cover_async(release_group_mbid: str) -> tuple[dict | None, str | None]:
+    """Devuelve (release, url de portada); las portadas se prueban todas a la vez."""
+    data = await mb_get_async(f"{MB_BASE}/release", params={
         "release-group": release_group_mbid,
         "fmt": "json",
         "limit": 10,   # prueba varios releases
     })
     releases = data.get("releases", [])
     if not releases:
-        return None
+        return None, None
 
-    # 1) intenta encontrar uno con portada
-    for rel in releases:
-        if caa_front_image_url(rel["id"]):
-            return rel
+    # 1) el primero (en el orden de MusicBrainz) que tenga portada
+    covers = await asyncio.gather(*(caa_front_image_url_async(rel["id"]) for rel in releases))
+    for rel, cover_url in zip(releases, covers):
+        if cover_url:
+            return rel, cover_url
 
     # 2) si ninguno tiene, devuelve el primero (al menos hay datos)
-    return releases[0]
+    return releases[0], None
 
-def get_tracks_from_release(release_mbid: str) -> list[dict]:
+async def get_tracks_from_release_async(release_mbid: str) -> list[dict]:
     # Incluimos recordings para obtener duración (length)
-    data = mb_get(f"{MB_BASE}/release/{release_mbid}", params={
+    data = await mb_get_async(f"{MB_BASE}/release/{release_mbid}", params={
         "inc": "recordings+artist-credits",
         "fmt": "json"
     })
@@ -121,10 +383,166 @@ def get_tracks_from_release(release_mbid: str) -> list[dict]:
             })
     return tracks_out
 
+
+# -- API SÍNCRONA (envoltorios de la asíncrona, mismas firmas que antes) --
+
+def mb_get(url, params=None):
+    return run(mb_get_async(url, params=params))
+
+def caa_front_image_url(release_mbid: str) -> str | None:
+    """Devuelve la URL de la portada frontal si existe."""
+    return run(caa_front_image_url_async(release_mbid))
+
+def find_artist_mbid(artist_name: str) -> str | None:
+    return run(find_artist_mbid_async(artist_name))
+
+def get_release_groups(artist_mbid: str, group_types=("album", "single", "ep"), limit=10):
+    return run(get_release_groups_async(artist_mbid, group_types=group_types, limit=limit))
+
+def pick_release_with_cover(release_group_mbid: str) -> dict | None:
+    release, _ = run(pick_release_with_cover_async(release_group_mbid))
+    return release
+
+def get_tracks_from_release(release_mbid: str) -> list[dict]:
+    return run(get_tracks_from_release_async(release_mbid))
+
 def iso_date_loose(d: str | None) -> str | None:
     return d if d else None
 
-def main():
+async def fetch_release_group(rg):
+    rg_title = rg.get("title")
+
+    try:
+        return await _fetch_release_group(rg)
+    except OfflineCacheMiss as e:
+        print(f"[WARN] Skipping {rg_title} (offline): {e}")
+        return None
+
+
+async def _fetch_release_group(rg):
+    rg_title = rg.get("title")
+
+    release, cover_url = await pick_release_with_cover_async(rg["id"])
+    if not release:
+        print(f"[WARN] No release for group: {rg_title}")
+        return None
+
+    tracks = await get_tracks_from_release_async(release["id"])
+    if not tracks:
+        # Si no hay tracklist, al menos guardamos un “item” (opcional)
+        print(f"[WARN] No tracks in release: {rg_title}")
+        return None
+
+    return {
+        "rg_title": rg_title,
+        "rg_first_release": iso_date_loose(rg.get("first-release-date")),
+        "rg_type": rg.get("primary-type"),
+        "release_mbid": release["id"],
+        "cover_url": cover_url,
+        "tracks": tracks,
+    }
+
+
+async def fetch_artist(artist_name, max_release_groups):
+    try:
+        artist_mbid = await find_artist_mbid_async(artist_name)
+        if not artist_mbid:
+            print(f"[WARN] No artist found: {artist_name}")
+            return []
+
+        rgs = await get_release_groups_async(artist_mbid, limit=max_release_groups)
+    except OfflineCacheMiss as e:
+        print(f"[WARN] Skipping {artist_name} (offline): {e}")
+        return []
+
+    print(f"[INFO] {artist_name}: {len(rgs)} release-groups")
+
+    releases = await asyncio.gather(*(fetch_release_group(rg) for rg in rgs))
+    return [r for r in releases if r]
+
+
+async def fetch_catalog(artists, max_release_groups):
+    """Descarga todo en paralelo; los limitadores por host marcan el ritmo real."""
+    results = await asyncio.gather(*(fetch_artist(a, max_release_groups) for a in artists))
+    return list(zip(artists, results))
+
+
+# Clave natural de una pista importada. El índice único también está declarado
+# en songReviews/indexes.py (ensure_mongo_indexes); aquí se crea por si el
+# script se lanza contra una BD sin índices.
+TRACK_KEY = ("name", "artist", "release_mbid")
+TRACK_KEY_INDEX = {
+    "keys": [(field, ASCENDING) for field in TRACK_KEY],
+    "name": "track_natural_key",
+    "unique": True,
+    "partialFilterExpression": {"release_mbid": {"$exists": True}},
+}
+
+
+def ensure_track_index(col):
+    spec = dict(TRACK_KEY_INDEX)
+    col.create_index(spec.pop("keys"), **spec)
+
+
+def upsert_release_tracks(db, docs):
+    """Inserta las pistas de un release que no existan todavía.
+
+    Solo las nuevas reciben code (un bloque del contador "songs").
+    Devuelve (insertadas, ya existentes).
+    """
+    col = db["songs"]
+    release_mbid = docs[0]["release_mbid"]
+    existing = {
+        tuple(d.get(k) for k in TRACK_KEY)
+        for d in col.find(
+            {"release_mbid": release_mbid, "name": {"$in": [d["name"] for d in docs]}},
+            {"_id": 0, "name": 1, "artist": 1, "release_mbid": 1},
+        )
+    }
+
+    new_docs = {}
+    for doc in docs:
+        key = tuple(doc[k] for k in TRACK_KEY)
+        if key not in existing and key not in new_docs:
+            new_docs[key] = doc
+
+    if not new_docs:
+        return 0, len(existing)
+
+    codes = allocate_codes(db, "songs", len(new_docs))
+    ops = [
+        UpdateOne(
+            {k: doc[k] for k in TRACK_KEY},
+            {"$setOnInsert": {**doc, "code": code}},
+            upsert=True,
+        )
+        for doc, code in zip(new_docs.values(), codes)
+    ]
+
+    # Si otro proceso la insertó entre medias, el upsert casa y no escribe nada
+    res = col.bulk_write(ops, ordered=False)
+    if res.upserted_count:
+        # versión de la tabla de canciones de songReviews/catalog.py, para que los workers recarguen
+        bump_version(db, "catalog_songs")
+    return res.upserted_count, len(existing) + res.matched_count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Importa canciones de MusicBrainz a Mongo.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--offline", action="store_true", help="Solo usa la caché local, sin red.")
+    mode.add_argument("--refresh", action="store_true", help="Ignora los TTL y revalida todo con el servidor.")
+    parser.add_argument("--cache", default=str(CACHE_PATH), help="Ruta de la caché SQLite.")
+    parser.add_argument("--no-cache", action="store_true", help="No usa la caché.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.no_cache:
+        engine.cache = ResponseCache(args.cache)
+        engine.mode = "offline" if args.offline else "refresh" if args.refresh else "normal"
+
     # --- CONFIG ---
     # cambiar ARTISTS cada vez que se quiera importar
     ARTISTS = [ "Amy Winehouse", "Ralphie Choo", "ROSALÍA", "PinkPantheress", "Troye Sivan", "rusowsky", "Sabrina Carpenter"]
@@ -135,46 +553,18 @@ def main():
     db = client["songreviews"]
     col = db["songs"]
 
-    # Traer dinámicamente el código disponible
-    last = col.find_one(
-        {"code": {"$exists": True}},
-        sort=[("code", -1)],
-        projection={"code": 1}
-    )
+    catalog = run(fetch_catalog(ARTISTS, MAX_RELEASE_GROUPS_PER_ARTIST))
+    engine.close()
 
-    code = (last["code"] if last else 0) + 1
+    ensure_track_index(col)
 
-    for artist_name in ARTISTS:
-        artist_mbid = find_artist_mbid(artist_name)
-        if not artist_mbid:
-            print(f"[WARN] No artist found: {artist_name}")
-            continue
-
-        rgs = get_release_groups(artist_mbid, limit=MAX_RELEASE_GROUPS_PER_ARTIST)
-        print(f"[INFO] {artist_name}: {len(rgs)} release-groups")
-
-        for rg in rgs:
-            rg_title = rg.get("title")
-            rg_first_release = iso_date_loose(rg.get("first-release-date"))
-            rg_type = rg.get("primary-type")
-
-            release = pick_release_with_cover(rg["id"])
-            if not release:
-                print(f"[WARN] No release for group: {rg_title}")
-                continue
-
-            release_mbid = release["id"]
-            cover_url = caa_front_image_url(release_mbid)
-
-            tracks = get_tracks_from_release(release_mbid)
-            if not tracks:
-                # Si no hay tracklist, al menos guardamos un “item” (opcional)
-                print(f"[WARN] No tracks in release: {rg_title}")
-                continue
+    for artist_name, releases in catalog:
+        artist_inserted = artist_matched = 0
 
+        for rel in releases:
             # Inserta tracks como canciones
             docs = []
-            for tr in tracks:
+            for tr in rel["tracks"]:
                 title = tr["title"]
                 if not title:
                     continue
@@ -183,38 +573,27 @@ def main():
                 if tr["length_ms"] is not None:
                     duration_sec = int(tr["length_ms"] / 1000)
 
-                doc = {
-                    "code": code,
+                docs.append({
                     "name": title,
                     "artist": tr["artist"] or artist_name,
                     "duration": duration_sec if duration_sec is not None else 0,
-                    "artwork": cover_url or "",  # si no hay, vacío
-                    "releaseDate": rg_first_release or "",
+                    "artwork": rel["cover_url"] or "",  # si no hay, vacío
+                    "releaseDate": rel["rg_first_release"] or "",
                     "categories": [],
                     # extras útiles (no estorban)
                     "source": "musicbrainz",
-                    "release_group": rg_title,
-                    "release_group_type": rg_type,
-                    "release_mbid": release_mbid,
-                }
-                docs.append(doc)
-                code += 1
+                    "release_group": rel["rg_title"],
+                    "release_group_type": rel["rg_type"],
+                    "release_mbid": rel["release_mbid"],
+                })
 
             if docs:
-                # evita duplicados por (name+artist+release_mbid) de forma sencilla
-                # (mejor sería un índice único, pero para pruebas vale)
-                inserted = 0
-                for d in docs:
-                    exists = col.find_one({
-                        "name": d["name"],
-                        "artist": d["artist"],
-                        "release_mbid": d["release_mbid"]
-                    }, {"_id": 1})
-                    if not exists:
-                        col.insert_one(d)
-                        inserted += 1
-
-                print(f"[OK] Inserted {inserted} tracks from: {artist_name} — {rg_title}")
+                inserted, matched = upsert_release_tracks(db, docs)
+                artist_inserted += inserted
+                artist_matched += matched
+                print(f"[OK] {artist_name} — {rel['rg_title']}: {inserted} inserted, {matched} already there")
+
+        print(f"[SUMMARY] {artist_name}: {artist_inserted} inserted, {artist_matched} matched")
 
     print("[DONE] Finished populating.")
 
@@ -0,0 +1,164 @@
+import uuid
+
+from asgiref.sync import sync_to_async
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from songReviews.catalog import with_song_fields
+from songReviews.mongo_pool import get_async_collection, get_collection, get_db
+
+# Resumen de valoraciones por canción (count, sum, avg e histograma 1–5).
+# add_review lo mantiene con deltas, así la media no necesita leer todas las reviews.
+
+SUMMARY_COLLECTION = "song_rating_summary"
+STARS = (1, 2, 3, 4, 5)
+
+SUMMARY_INDEXES = [
+    IndexModel([("songCode", ASCENDING)], name="songCode_unique", unique=True),
+    # top reviewed: solo canciones con 2+ reviews, ordenadas por media
+    IndexModel(
+        [("avg", DESCENDING), ("count", DESCENDING)],
+        name="leaderboard",
+        partialFilterExpression={"count": {"$gte": 2}},
+    ),
+]
+
+
+def _summary_col():
+    return get_collection(SUMMARY_COLLECTION)
+
+
+def review_delta(old_rating, new_rating):
+    """Devuelve (dcount, dsum, {estrella: delta}) al pasar de old_rating a new_rating."""
+    hist = {}
+    if old_rating is not None:
+        hist[int(old_rating)] = hist.get(int(old_rating), 0) - 1
+    if new_rating is not None:
+        hist[int(new_rating)] = hist.get(int(new_rating), 0) + 1
+    hist = {k: v for k, v in hist.items() if v}
+
+    dcount = (new_rating is not None) - (old_rating is not None)
+    dsum = int(new_rating or 0) - int(old_rating or 0)
+    return dcount, dsum, hist
+
+
+def apply_review(song_code, old_rating, new_rating):
+    dcount, dsum, hist = review_delta(old_rating, new_rating)
+    if not dcount and not dsum and not hist:
+        return
+
+    def plus(field, delta):
+        return {"$add": [{"$ifNull": [f"${field}", 0]}, delta]}
+
+    fields = {"count": plus("count", dcount), "sum": plus("sum", dsum)}
+    for star, delta in hist.items():
+        fields[f"hist.{star}"] = plus(f"hist.{star}", delta)
+
+    # Update con pipeline: los $inc y el avg se aplican en una sola operación atómica
+    _summary_col().update_one(
+        {"songCode": int(song_code)},
+        [
+            {"$set": fields},
+            {"$set": {"avg": {"$cond": [
+                {"$gt": ["$count", 0]},
+                {"$divide": ["$sum", "$count"]},
+                None,
+            ]}}},
+        ],
+        upsert=True,
+    )
+
+
+def empty_summary(song_code):
+    return {
+        "songCode": int(song_code),
+        "count": 0,
+        "sum": 0,
+        "avg": None,
+        "hist": {str(s): 0 for s in STARS},
+    }
+
+
+def get_summary(song_code):
+    return _summary_from(song_code, _summary_col().find_one({"songCode": int(song_code)}, {"_id": 0}))
+
+
+async def get_summary_async(song_code):
+    doc = await get_async_collection(SUMMARY_COLLECTION).find_one({"songCode": int(song_code)}, {"_id": 0})
+    return _summary_from(song_code, doc)
+
+
+def _summary_from(song_code, doc):
+    summary = empty_summary(song_code)
+    if doc:
+        summary.update(doc)
+        summary["hist"] = {str(s): int((doc.get("hist") or {}).get(str(s), 0)) for s in STARS}
+    return summary
+
+
+def histogram_rows(summary):
+    total = summary["count"] or 0
+    rows = []
+    for star in reversed(STARS):
+        n = summary["hist"].get(str(star), 0)
+        rows.append({
+            "stars": star,
+            "count": n,
+            "pct": round(100 * n / total, 1) if total else 0,
+        })
+    return rows
+
+
+def rebuild_summaries():
+    """Recalcula song_rating_summary desde reviews y lo sustituye de golpe."""
+    db = get_db()
+    tmp_name = f"{SUMMARY_COLLECTION}_rebuild_{uuid.uuid4().hex[:8]}"
+    tmp = db[tmp_name]
+    tmp.create_indexes(SUMMARY_INDEXES)
+
+    star_counts = {
+        str(s): {"$sum": {"$cond": [{"$eq": ["$rating", s]}, 1, 0]}}
+        for s in STARS
+    }
+    group = {"_id": "$songCode", "count": {"$sum": 1}, "sum": {"$sum": "$rating"}}
+    group.update({f"r{s}": acc for s, acc in star_counts.items()})
+
+    db["reviews"].aggregate([
+        {"$match": {"songCode": {"$ne": None}, "rating": {"$in": list(STARS)}}},
+        {"$group": group},
+        {"$project": {
+            "_id": 0,
+            "songCode": "$_id",
+            "count": 1,
+            "sum": 1,
+            "avg": {"$divide": ["$sum", "$count"]},
+            "hist": {str(s): f"$r{s}" for s in STARS},
+        }},
+        {"$out": tmp_name},
+    ], allowDiskUse=True)
+
+    tmp.rename(SUMMARY_COLLECTION, dropTarget=True)
+    return db[SUMMARY_COLLECTION].estimated_document_count()
+
+
+def top_reviewed_pipeline(limit=20, min_reviews=2):
+    return [
+        {"$match": {"count": {"$gte": min_reviews}}},
+        {"$sort": {"avg": -1, "count": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "code": "$songCode",
+            "avg": {"$round": ["$avg", 2]},
+            "reviews": "$count",
+        }}
+    ]
+
+
+def top_reviewed_songs(limit=20, min_reviews=2):
+    # name/artist/artwork salen del catálogo en vez de un $lookup a songs
+    return with_song_fields(list(_summary_col().aggregate(top_reviewed_pipeline(limit, min_reviews))))
+
+
+async def top_reviewed_songs_async(limit=20, min_reviews=2):
+    cursor = await get_async_collection(SUMMARY_COLLECTION).aggregate(top_reviewed_pipeline(limit, min_reviews))
+    return await sync_to_async(with_song_fields, thread_sensitive=False)(await cursor.to_list())
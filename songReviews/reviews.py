@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.utils.formats import date_format
+from django.utils.timezone import is_naive, localtime, make_aware
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from songReviews.mongo_pool import get_async_collection, get_collection
+
+# Paginación por cursor (keyset) de las reviews de una canción.
+# Orden: reviewDate desc, _id desc -> el cursor es el último (reviewDate, _id) servido.
+# Las reviews antiguas sin reviewDate van al final (null es el menor en Mongo).
+
+PAGE_SIZE = 20
+REVIEW_FIELDS = {"_id": 1, "user": 1, "reviewDate": 1, "rating": 1, "comments": 1}
+REVIEW_SORT = [("reviewDate", DESCENDING), ("_id", DESCENDING)]
+REVIEW_PAGE_INDEX = [("songCode", ASCENDING), ("reviewDate", DESCENDING), ("_id", DESCENDING)]
+
+
+# Lo construye manage.py ensure_mongo_indexes (ver songReviews/indexes.py)
+REVIEW_INDEXES = [
+    IndexModel(REVIEW_PAGE_INDEX, name="songCode_reviewDate_id"),
+]
+
+
+class BadCursor(ValueError):
+    pass
+
+
+def encode_cursor(review):
+    date = review.get("reviewDate")
+    raw = json.dumps([date.isoformat() if date else None, str(review["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_s, oid = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(date_s) if date_s is not None else None, ObjectId(oid)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise BadCursor(str(e)) from e
+
+
+def _page_query(song_code, cursor):
+    query = {"songCode": int(song_code)}
+    if cursor:
+        date, oid = decode_cursor(cursor)
+        if date is None:
+            query.update({"reviewDate": None, "_id": {"$lt": oid}})
+        else:
+            query["$or"] = [
+                {"reviewDate": {"$lt": date}},
+                {"reviewDate": date, "_id": {"$lt": oid}},
+                {"reviewDate": None},
+            ]
+    return query
+
+
+def _split_page(docs, limit):
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def reviews_page(song_code, cursor=None, limit=PAGE_SIZE):
+    """Devuelve (reviews, next_cursor). next_cursor es None si no hay más."""
+    docs = list(
+        get_collection("reviews")
+        .find(_page_query(song_code, cursor), REVIEW_FIELDS)
+        .sort(REVIEW_SORT)
+        .limit(limit + 1)
+    )
+    return _split_page(docs, limit)
+
+
+async def reviews_page_async(song_code, cursor=None, limit=PAGE_SIZE):
+    docs = await (
+        get_async_collection("reviews")
+        .find(_page_query(song_code, cursor), REVIEW_FIELDS)
+        .sort(REVIEW_SORT)
+        .limit(limit + 1)
+        .to_list()
+    )
+    return _split_page(docs, limit)
+
+
+def review_to_json(review):
+    date = review.get("reviewDate")
+    if isinstance(date, datetime):
+        if is_naive(date):
+            date = make_aware(date, timezone.utc)
+        date = date_format(localtime(date), "DATETIME_FORMAT")
+    return {
+        "user": review.get("user", "Anonymous"),
+        "reviewDate": date or "",
+        "rating": review.get("rating", ""),
+        "comments": review.get("comments", ""),
+    }
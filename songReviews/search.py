@@ -0,0 +1,225 @@
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from songReviews.catalog import VERSION_NAMES, get_catalog
+from songReviews.counters import read_version
+from songReviews.mongo_pool import get_collection, get_db
+
+# Búsqueda de canciones por nombre/artista.
+# El backend se elige en settings.SONG_SEARCH["BACKEND"]; show_songs y
+# go_categories lo usan a través de search_songs() / ranked_songs().
+
+DEFAULT_SEARCH = {
+    "BACKEND": "songReviews.search.InMemorySearchBackend",
+    "OPTIONS": {},
+}
+
+# name pesa más que artist
+FIELD_WEIGHTS = (("name", 3.0), ("artist", 2.0))
+PREFIX_FACTOR = 0.6
+PHRASE_BONUS = 1.0
+MAX_PREFIX_TERMS = 200
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def fold(text):
+    """Minúsculas y sin tildes: "ROSALÍA" -> "rosalia"."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.casefold()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+class SearchBackend:
+    def __init__(self, **options):
+        self.options = options
+
+    def search(self, query, limit=None):
+        """Devuelve los códigos de canción que casan con query, de más a menos relevante."""
+        raise NotImplementedError
+
+    def invalidate(self):
+        """Avisa de que el catálogo ha cambiado."""
+
+
+class _SongIndex:
+    def __init__(self, docs):
+        self.postings = defaultdict(dict)   # término -> {code: peso}
+        self.names = {}                     # code -> nombre normalizado (bonus de frase)
+
+        for doc in docs:
+            if doc.get("code") is None:
+                continue
+            code = int(doc["code"])
+            self.names[code] = " ".join(tokenize(doc.get("name")))
+            for field, weight in FIELD_WEIGHTS:
+                for token in set(tokenize(doc.get(field))):
+                    if weight > self.postings[token].get(code, 0):
+                        self.postings[token][code] = weight
+
+        self.terms = sorted(self.postings)
+        self.size = len(self.names)
+
+    def expand(self, token):
+        """(término, exacto) para token y los términos que empiezan por él."""
+        i = bisect_left(self.terms, token)
+        n = 0
+        while i < len(self.terms) and self.terms[i].startswith(token) and n < MAX_PREFIX_TERMS:
+            term = self.terms[i]
+            yield term, term == token
+            i += 1
+            n += 1
+
+    def idf(self, term):
+        return math.log(1 + self.size / len(self.postings[term]))
+
+
+class InMemorySearchBackend(SearchBackend):
+    """Índice invertido en memoria (uno por worker) con búsqueda por prefijo.
+
+    Se construye desde la tabla de canciones del catálogo (catalog.py), así
+    que las canciones no se leen de Mongo dos veces por worker.
+
+    Se reconstruye si alguien llama a invalidate(), si cambia la versión de
+    la tabla de canciones del catálogo (compartida entre workers en counters,
+    ver invalidate_catalog en catalog.py; se mira cada CHECK_SECONDS) o cada
+    REFRESH_SECONDS como mucho.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.refresh_seconds = options.get("REFRESH_SECONDS", 300)
+        self.check_seconds = options.get("CHECK_SECONDS", 10)
+        self._lock = threading.Lock()
+        self._index = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._version = None
+
+    def invalidate(self):
+        self._built_at = 0.0
+        self._checked_at = 0.0
+
+    def _stale(self, now):
+        if self._index is None or now - self._built_at > self.refresh_seconds:
+            return True
+        if now - self._checked_at > self.check_seconds:
+            self._checked_at = now
+            return read_version(get_db(), VERSION_NAMES["songs"]) != self._version
+        return False
+
+    def _current(self):
+        now = time.monotonic()
+        if not self._stale(now):
+            return self._index
+
+        with self._lock:
+            # Si otro hilo lo ha reconstruido mientras esperábamos, vale ese
+            if self._built_at < now:
+                self._version, self._index = self._build()
+                self._built_at = self._checked_at = time.monotonic()
+        return self._index
+
+    def _build(self):
+        # De la tabla de canciones del catálogo, que ya está en memoria; de
+        # Mongo solo si el catálogo no la guarda (no cabe en MAX_BYTES)
+        songs, version = get_catalog().song_table()
+        if songs is not None:
+            return version, _SongIndex(songs.iter_rows())
+
+        # La versión antes de leer: lo que cambie mientras tanto provoca otra reconstrucción
+        version = read_version(get_db(), VERSION_NAMES["songs"])
+        docs = get_collection("songs").find({}, {"_id": 0, "code": 1, "name": 1, "artist": 1})
+        return version, _SongIndex(docs)
+
+    def search(self, query, limit=None):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        index = self._current()
+        scores = None
+        for token in tokens:
+            matched = {}
+            for term, exact in index.expand(token):
+                factor = index.idf(term) * (1.0 if exact else PREFIX_FACTOR)
+                for code, weight in index.postings[term].items():
+                    score = weight * factor
+                    if score > matched.get(code, 0):
+                        matched[code] = score
+
+            # Todas las palabras tienen que aparecer (AND)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {code: scores[code] + s for code, s in matched.items() if code in scores}
+            if not scores:
+                return []
+
+        phrase = " ".join(tokens)
+        for code in scores:
+            if phrase in index.names.get(code, ""):
+                scores[code] += PHRASE_BONUS
+
+        ranked = sorted(scores, key=lambda code: (-scores[code], code))
+        return ranked[:limit] if limit else ranked
+
+
+class MongoTextSearchBackend(SearchBackend):
+    """Usa el índice de texto name_artist_text de songs (ver indexes.py).
+
+    Mongo ya ignora mayúsculas y tildes; no hace búsqueda por prefijo.
+    """
+
+    def search(self, query, limit=None):
+        if not tokenize(query):
+            return []
+
+        cursor = get_collection("songs").find(
+            {"$text": {"$search": query}},
+            {"_id": 0, "code": 1, "score": {"$meta": "textScore"}},
+        ).sort([("score", {"$meta": "textScore"}), ("code", 1)])
+        if limit:
+            cursor = cursor.limit(limit)
+        return [int(doc["code"]) for doc in cursor if doc.get("code") is not None]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = {**DEFAULT_SEARCH, **getattr(settings, "SONG_SEARCH", {})}
+                _backend = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+    return _backend
+
+
+def search_songs(query, limit=None):
+    return get_search_backend().search(query, limit=limit)
+
+
+def invalidate_search():
+    get_search_backend().invalidate()
+
+
+def ranked_songs(queryset, query, limit=None):
+    """Filtra queryset por query y lo devuelve como lista en orden de relevancia."""
+    codes = search_songs(query, limit=limit)
+    by_code = {int(s.code): s for s in queryset.filter(code__in=codes)}
+    return [by_code[code] for code in codes if code in by_code]
@@ -0,0 +1,270 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import bson
+from django.conf import settings
+from pymongo import DESCENDING, IndexModel, monitoring
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from songReviews.metrics import current_request_stats
+from songReviews.mongo_pool import get_db
+
+# Registro de operaciones Mongo lentas (colección capped slow_ops).
+# SlowOpListener mira la duración de cada comando; si pasa de THRESHOLD_MS
+# guarda el comando, la duración, los documentos devueltos y, para find /
+# aggregate / count / distinct, un explain("executionStats") con los
+# documentos examinados. El explain vuelve a ejecutar la consulta, así que
+# se hace en un hilo aparte y como mucho una vez cada EXPLAIN_SECONDS por
+# forma de consulta (shape).
+#
+# No se explican getMore (no llevan la consulta original) ni los aggregate
+# con $out/$merge (explain con executionStats los ejecutaría).
+
+logger = logging.getLogger(__name__)
+
+SLOW_OPS_COLLECTION = "slow_ops"
+
+DEFAULT_SLOW_OPS = {
+    "ENABLED": True,
+    "THRESHOLD_MS": 100,
+    "EXPLAIN": True,
+    "EXPLAIN_SECONDS": 300,
+    "CAPPED_BYTES": 16 * 1024 * 1024,
+    "CAPPED_MAX": 5000,
+}
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+WRITE_STAGES = {"$out", "$merge"}
+IGNORED_COMMANDS = {"explain", "getMore", "hello", "isMaster", "ping", "endSessions", "killCursors"}
+
+# Campos del protocolo que no forman parte de la consulta
+META_FIELDS = {"lsid", "$clusterTime", "$db", "$readPreference", "txnNumber", "readConcern", "writeConcern"}
+
+MAX_COMMAND_BYTES = 64 * 1024
+
+SLOW_OPS_INDEXES = [
+    IndexModel([("shape", 1), ("durationMs", DESCENDING)], name="shape_durationMs"),
+]
+
+
+def _config():
+    return {**DEFAULT_SLOW_OPS, **getattr(settings, "SLOW_OPS", {})}
+
+
+def _target(command_name, command):
+    value = command.get(command_name)
+    return value if isinstance(value, str) else None
+
+
+def command_shape(command_name, command):
+    """Forma de la consulta sin valores: "aggregate ranking $addFields,$unwind,$group"."""
+    collection = _target(command_name, command) or ""
+    if command_name == "aggregate":
+        detail = ",".join(next(iter(stage), "?") for stage in command.get("pipeline") or [])
+    elif command_name in ("find", "count", "distinct"):
+        detail = ",".join(sorted((command.get("filter") or command.get("query") or {}).keys()))
+    elif command_name in ("update", "delete"):
+        ops = command.get("updates") or command.get("deletes") or []
+        detail = ",".join(sorted((ops[0].get("q") or {}).keys())) if ops else ""
+    else:
+        detail = ""
+    return f"{command_name} {collection} {detail}".strip()
+
+
+def _clean(command):
+    return {k: v for k, v in command.items() if k not in META_FIELDS}
+
+
+def _docs_returned(command_name, reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        if batch is not None:
+            return len(batch)
+    if command_name in ("count", "update", "delete", "insert"):
+        return reply.get("n")
+    if command_name == "distinct":
+        return len(reply.get("values") or [])
+    return None
+
+
+def _find(doc, key):
+    """Primer valor de key en un explain anidado (cambia entre motores y versiones)."""
+    if isinstance(doc, dict):
+        if key in doc:
+            return doc[key]
+        values = doc.values()
+    elif isinstance(doc, list):
+        values = doc
+    else:
+        return None
+    for value in values:
+        found = _find(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _plan_stages(plan):
+    stages = []
+    while isinstance(plan, dict):
+        if plan.get("stage"):
+            stages.append(plan["stage"])
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+
+class SlowOpRecorder:
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-ops")
+        self._explained = {}    # shape -> último explain (monotonic)
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _ensure_collection(self, db, config):
+        if self._ready:
+            return
+        try:
+            db.create_collection(
+                SLOW_OPS_COLLECTION, capped=True, size=config["CAPPED_BYTES"], max=config["CAPPED_MAX"],
+            )
+        except CollectionInvalid:
+            pass
+        db[SLOW_OPS_COLLECTION].create_indexes(SLOW_OPS_INDEXES)
+        self._ready = True
+
+    def _should_explain(self, shape, command_name, command, config):
+        if not config["EXPLAIN"] or command_name not in EXPLAINABLE:
+            return False
+        if command_name == "aggregate":
+            if any(next(iter(stage), None) in WRITE_STAGES for stage in command.get("pipeline") or []):
+                return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained.get(shape, -config["EXPLAIN_SECONDS"]) < config["EXPLAIN_SECONDS"]:
+                return False
+            self._explained[shape] = now
+        return True
+
+    def submit(self, doc, command_name, command, database_name):
+        config = _config()
+        explain = self._should_explain(doc["shape"], command_name, command, config)
+        self._executor.submit(self._record, doc, command if explain else None, database_name, config)
+
+    def _record(self, doc, command, database_name, config):
+        try:
+            db = get_db()
+            self._ensure_collection(db, config)
+
+            if command is not None:
+                plan = db.client[database_name].command(
+                    {"explain": command, "verbosity": "executionStats"},
+                )
+                doc["docsExamined"] = _find(plan, "totalDocsExamined")
+                doc["keysExamined"] = _find(plan, "totalKeysExamined")
+                doc["nReturned"] = _find(plan, "nReturned")
+                doc["planStages"] = _plan_stages(_find(plan, "winningPlan"))
+                doc["explain"] = {
+                    "queryPlanner": _find(plan, "queryPlanner"),
+                    "executionStats": _find(plan, "executionStats"),
+                    "stages": plan.get("stages"),
+                }
+
+            if len(bson.encode(doc)) > 15 * 1024 * 1024:
+                doc.pop("explain", None)
+            db[SLOW_OPS_COLLECTION].insert_one(doc)
+        except PyMongoError:
+            logger.exception("Could not record slow Mongo operation %s", doc.get("shape"))
+
+
+class SlowOpListener(monitoring.CommandListener):
+    """Guarda los comandos que se van a poder explicar hasta saber cuánto tardan."""
+
+    def __init__(self):
+        self.recorder = SlowOpRecorder()
+        self._pending = {}
+
+    def _key(self, event):
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        if _target(event.command_name, event.command) == SLOW_OPS_COLLECTION:
+            return
+        self._pending[self._key(event)] = (_clean(event.command), event.database_name)
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def _finish(self, event, reply):
+        pending = self._pending.pop(self._key(event), None)
+        if pending is None:
+            return
+
+        config = _config()
+        duration_ms = event.duration_micros / 1000
+        if not config["ENABLED"] or duration_ms < config["THRESHOLD_MS"]:
+            return
+
+        command, database_name = pending
+        request = current_request_stats()
+        doc = {
+            "ts": datetime.now(timezone.utc),
+            "command": event.command_name,
+            "collection": _target(event.command_name, command),
+            "shape": command_shape(event.command_name, command),
+            "durationMs": round(duration_ms, 3),
+            "docsReturned": _docs_returned(event.command_name, reply) if reply is not None else None,
+            "failed": reply is None,
+            "path": request.path if request is not None else None,
+            "query": command if len(bson.encode(command)) <= MAX_COMMAND_BYTES else {"truncated": True},
+        }
+        self.recorder.submit(doc, event.command_name, command, database_name)
+
+
+def threshold_ms():
+    return _config()["THRESHOLD_MS"]
+
+
+def worst_offenders(limit=50):
+    """Una fila por forma de consulta, de la más lenta a la menos."""
+    return list(get_db()[SLOW_OPS_COLLECTION].aggregate([
+        {"$sort": {"durationMs": -1}},
+        {"$group": {
+            "_id": "$shape",
+            "count": {"$sum": 1},
+            "maxMs": {"$max": "$durationMs"},
+            "avgMs": {"$avg": "$durationMs"},
+            "lastSeen": {"$max": "$ts"},
+            "paths": {"$addToSet": "$path"},
+            "docsReturned": {"$max": "$docsReturned"},
+            "docsExamined": {"$max": "$docsExamined"},
+            "planStages": {"$max": "$planStages"},
+            # el explain solo está en algunas (uno por shape cada EXPLAIN_SECONDS)
+            "explain": {"$max": "$explain"},
+            "sample": {"$first": "$query"},
+        }},
+        {"$sort": {"maxMs": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "shape": "$_id",
+            "count": 1,
+            "maxMs": {"$round": ["$maxMs", 1]},
+            "avgMs": {"$round": ["$avgMs", 1]},
+            "lastSeen": 1,
+            "paths": 1,
+            "docsReturned": 1,
+            "docsExamined": 1,
+            "planStages": 1,
+            "query": "$sample",
+            "explain": 1,
+        }},
+    ], allowDiskUse=True))
@@ -0,0 +1,50 @@
+from pymongo import ASCENDING
+
+from songReviews.mongo_pool import get_collection
+from songReviews.search import search_songs
+
+# Listado paginado del catálogo (songs.html y su endpoint JSON).
+# Sin búsqueda: keyset por code (cursor = último code servido).
+# Con búsqueda: el orden es el de relevancia, así que el cursor es un offset.
+
+PAGE_SIZE = 30
+CARD_FIELDS = {"_id": 0, "code": 1, "name": 1, "artist": 1, "artwork": 1, "releaseDate": 1}
+
+
+def _card(doc):
+    return {
+        "code": int(doc["code"]),
+        "name": doc.get("name", ""),
+        "artist": doc.get("artist", ""),
+        "artwork": doc.get("artwork", ""),
+        "releaseDate": doc.get("releaseDate", ""),
+    }
+
+
+def song_cards_page(q="", cursor=None, limit=PAGE_SIZE):
+    """Devuelve (cards, next_cursor, total). Lanza ValueError si el cursor no es válido."""
+    col = get_collection("songs")
+    position = int(cursor) if cursor else None
+    if position is not None and position < 0:
+        raise ValueError(f"negative cursor: {position}")
+
+    if q:
+        codes = search_songs(q)
+        offset = position or 0
+        page_codes = codes[offset:offset + limit]
+        by_code = {
+            int(d["code"]): d
+            for d in col.find({"code": {"$in": page_codes}}, CARD_FIELDS)
+        }
+        cards = [_card(by_code[c]) for c in page_codes if c in by_code]
+        next_offset = offset + limit
+        next_cursor = str(next_offset) if next_offset < len(codes) else None
+        return cards, next_cursor, len(codes)
+
+    listed = {"code": {"$ne": None}}
+    query = {"code": {"$gt": position}} if position is not None else listed
+    docs = list(col.find(query, CARD_FIELDS).sort("code", ASCENDING).limit(limit + 1))
+    cards = [_card(d) for d in docs[:limit]]
+    next_cursor = str(cards[-1]["code"]) if len(docs) > limit else None
+    # mismo filtro que el listado: las canciones sin code no se cuentan
+    return cards, next_cursor, col.count_documents(listed)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Caché de los resultados de stats con protección contra estampidas.
+# Cada entrada guarda el valor y hasta cuándo es "fresca"; en la caché vive
+# TTL + STALE_GRACE segundos. Cuando caduca, un solo worker (el que consigue
+# el lock con cache.add) recalcula y el resto sirve el valor anterior.
+#
+# Con varios workers hay que usar una caché compartida (FileBasedCache o
+# DatabaseCache, ver CACHES en settings); con LocMemCache cada proceso tiene la suya.
+
+DEFAULT_STATS_CACHE = {
+    "ALIAS": "stats",
+    "TTL": 60,
+    "STALE_GRACE": 600,
+    "LOCK_TIMEOUT": 30,
+    "WAIT_SECONDS": 5,
+}
+
+KEY_PREFIX = "stats:"
+
+
+def _config():
+    return {**DEFAULT_STATS_CACHE, **getattr(settings, "STATS_CACHE", {})}
+
+
+def _cache():
+    return caches[_config()["ALIAS"]]
+
+
+def _store(cache, key, value, ttl, grace):
+    cache.set(KEY_PREFIX + key, {"value": value, "fresh_until": time.time() + ttl}, ttl + grace)
+
+
+def cached_stat(key, compute):
+    config = _config()
+    cache = _cache()
+    entry = cache.get(KEY_PREFIX + key)
+
+    if entry is not None and entry["fresh_until"] > time.time():
+        return entry["value"]
+
+    lock_key = f"{KEY_PREFIX}{key}:lock"
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, config["LOCK_TIMEOUT"]):
+        try:
+            value = compute()
+            _store(cache, key, value, config["TTL"], config["STALE_GRACE"])
+            return value
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    # Otro worker está recalculando: valor anterior si lo hay...
+    if entry is not None:
+        return entry["value"]
+
+    # ...si no, esperamos un poco a que termine antes de calcularlo nosotros
+    deadline = time.monotonic() + config["WAIT_SECONDS"]
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(KEY_PREFIX + key)
+        if entry is not None:
+            return entry["value"]
+    return compute()
+
+
+async def acached_stat(key, acompute):
+    """Igual que cached_stat, para vistas async (acompute es una corrutina)."""
+    config = _config()
+    cache = _cache()
+    entry = await cache.aget(KEY_PREFIX + key)
+
+    if entry is not None and entry["fresh_until"] > time.time():
+        return entry["value"]
+
+    lock_key = f"{KEY_PREFIX}{key}:lock"
+    token = uuid.uuid4().hex
+    if await cache.aadd(lock_key, token, config["LOCK_TIMEOUT"]):
+        try:
+            value = await acompute()
+            await cache.aset(
+                KEY_PREFIX + key,
+                {"value": value, "fresh_until": time.time() + config["TTL"]},
+                config["TTL"] + config["STALE_GRACE"],
+            )
+            return value
+        finally:
+            if await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+
+    if entry is not None:
+        return entry["value"]
+
+    deadline = time.monotonic() + config["WAIT_SECONDS"]
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await cache.aget(KEY_PREFIX + key)
+        if entry is not None:
+            return entry["value"]
+    return await acompute()
+
+
+def invalidate_stats(*keys):
+    """Marca las entradas como caducadas sin borrarlas (se siguen sirviendo mientras se recalculan)."""
+    config = _config()
+    cache = _cache()
+    for key in keys:
+        entry = cache.get(KEY_PREFIX + key)
+        if entry is not None:
+            entry["fresh_until"] = 0
+            cache.set(KEY_PREFIX + key, entry, config["STALE_GRACE"])
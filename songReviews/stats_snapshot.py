@@ -0,0 +1,431 @@
+import uuid
+
+from asgiref.sync import sync_to_async
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import OperationFailure
+
+from songReviews.catalog import with_category_fields, with_song_fields
+from songReviews.mongo_pool import get_async_collection, get_collection, get_db
+from songReviews.tierlists import RANKLIST_STAGE
+
+# Snapshot de las estadísticas de rankings (stats.html).
+# save_tierlist aplica la diferencia entre el rankList anterior y el nuevo, así
+# la página de stats no tiene que hacer $unwind de toda la colección ranking.
+#
+#   {kind: "global",   code: 0, rankings, placements}
+#   {kind: "song",     code,    scoreSum, votes, sCount, avg}
+#   {kind: "category", code,    scoreSum, placements, rankings, avg}
+
+SNAPSHOT_COLLECTION = "stats_snapshot"
+
+SNAPSHOT_INDEXES = [
+    IndexModel([("kind", ASCENDING), ("code", ASCENDING)], name="kind_code_unique", unique=True),
+    IndexModel([("kind", ASCENDING), ("avg", DESCENDING), ("votes", DESCENDING)], name="kind_avg_votes"),
+    IndexModel([("kind", ASCENDING), ("avg", DESCENDING), ("placements", DESCENDING)], name="kind_avg_placements"),
+]
+
+# Igual que en los pipelines originales de stats
+SCORE_EXPR = {"$toInt": {"$ifNull": ["$rankList.score", 0]}}
+
+
+def _snapshot_col():
+    return get_collection(SNAPSHOT_COLLECTION)
+
+
+def item_score(item):
+    try:
+        return int(item.get("score") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _placements(rank_list):
+    return [
+        (int(item["song"]), item_score(item))
+        for item in (rank_list or [])
+        if item.get("song") is not None
+    ]
+
+
+def tierlist_deltas(old_list, new_list, is_new):
+    """Diferencias entre dos rankList de un mismo ranking.
+
+    Devuelve (songs, category, overview):
+      songs    -> {code: (dScoreSum, dVotes, dSCount)}
+      category -> (dScoreSum, dPlacements, dRankings)
+      overview -> (dRankings, dPlacements)
+    """
+    old = _placements(old_list)
+    new = _placements(new_list)
+
+    songs = {}
+    for sign, placements in ((-1, old), (1, new)):
+        for code, score in placements:
+            d_sum, d_votes, d_s = songs.get(code, (0, 0, 0))
+            songs[code] = (d_sum + sign * score, d_votes + sign, d_s + sign * (score == 5))
+    songs = {code: d for code, d in songs.items() if any(d)}
+
+    d_score = sum(s for _, s in new) - sum(s for _, s in old)
+    d_placements = len(new) - len(old)
+    d_rankings = int(bool(new)) - int(bool(old))
+
+    return songs, (d_score, d_placements, d_rankings), (int(is_new), d_placements)
+
+
+def _plus(field, delta):
+    return {"$add": [{"$ifNull": [f"${field}", 0]}, delta]}
+
+
+def _avg(total_field, count_field):
+    return {"$cond": [
+        {"$gt": [f"${count_field}", 0]},
+        {"$divide": [f"${total_field}", f"${count_field}"]},
+        None,
+    ]}
+
+
+def apply_tierlist_change(category_code, old_list, new_list, is_new):
+    songs, category, overview = tierlist_deltas(old_list, new_list, is_new)
+
+    ops = []
+    for code, (d_sum, d_votes, d_s) in songs.items():
+        ops.append(UpdateOne(
+            {"kind": "song", "code": code},
+            [
+                {"$set": {
+                    "scoreSum": _plus("scoreSum", d_sum),
+                    "votes": _plus("votes", d_votes),
+                    "sCount": _plus("sCount", d_s),
+                }},
+                {"$set": {"avg": _avg("scoreSum", "votes")}},
+            ],
+            upsert=True,
+        ))
+
+    d_score, d_placements, d_rankings = category
+    if d_score or d_placements or d_rankings:
+        ops.append(UpdateOne(
+            {"kind": "category", "code": int(category_code)},
+            [
+                {"$set": {
+                    "scoreSum": _plus("scoreSum", d_score),
+                    "placements": _plus("placements", d_placements),
+                    "rankings": _plus("rankings", d_rankings),
+                }},
+                {"$set": {"avg": _avg("scoreSum", "placements")}},
+            ],
+            upsert=True,
+        ))
+
+    o_rankings, o_placements = overview
+    if o_rankings or o_placements:
+        ops.append(UpdateOne(
+            {"kind": "global", "code": 0},
+            {"$inc": {"rankings": o_rankings, "placements": o_placements}},
+            upsert=True,
+        ))
+
+    if ops:
+        _snapshot_col().bulk_write(ops, ordered=False)
+
+
+# -- LECTURAS (stats) --
+
+OVERVIEW_QUERY = {"kind": "global", "code": 0}
+
+
+def _overview_from(doc):
+    doc = doc or {}
+    return {
+        "total_rankings": int(doc.get("rankings", 0)),
+        "total_placements": int(doc.get("placements", 0)),
+    }
+
+
+def top_avg_score_pipeline(limit=20, min_votes=2):
+    return [
+        {"$match": {"kind": "song", "votes": {"$gte": min_votes}}},
+        {"$sort": {"avg": -1, "votes": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "code": 1,
+            "avg": {"$round": ["$avg", 2]},
+            "votes": 1,
+            "sRate": {"$round": [{"$multiply": [{"$divide": ["$sCount", "$votes"]}, 100]}, 1]},
+        }},
+    ]
+
+
+def category_scores_pipeline():
+    return [
+        {"$match": {"kind": "category", "placements": {"$gt": 0}}},
+        {"$sort": {"avg": -1, "placements": -1}},
+        {"$project": {
+            "_id": 0,
+            "code": 1,
+            "avg": {"$round": ["$avg", 2]},
+            "placements": 1,
+            "rankingCount": "$rankings",
+        }},
+    ]
+
+
+def snapshot_overview():
+    return _overview_from(_snapshot_col().find_one(OVERVIEW_QUERY))
+
+
+def top_avg_score(limit=20, min_votes=2):
+    return with_song_fields(list(_snapshot_col().aggregate(top_avg_score_pipeline(limit, min_votes))))
+
+
+def category_scores():
+    return with_category_fields(list(_snapshot_col().aggregate(category_scores_pipeline())))
+
+
+# Versiones async (vista stats): las mismas consultas con get_async_collection.
+# Los nombres salen del catálogo, que es síncrono, en un hilo aparte.
+
+async def snapshot_overview_async():
+    return _overview_from(await get_async_collection(SNAPSHOT_COLLECTION).find_one(OVERVIEW_QUERY))
+
+
+async def top_avg_score_async(limit=20, min_votes=2):
+    cursor = await get_async_collection(SNAPSHOT_COLLECTION).aggregate(top_avg_score_pipeline(limit, min_votes))
+    return await sync_to_async(with_song_fields, thread_sensitive=False)(await cursor.to_list())
+
+
+async def category_scores_async():
+    cursor = await get_async_collection(SNAPSHOT_COLLECTION).aggregate(category_scores_pipeline())
+    return await sync_to_async(with_category_fields, thread_sensitive=False)(await cursor.to_list())
+
+
+# -- RECÁLCULO DESDE ranking --
+
+def live_song_stats_pipeline():
+    return [
+        RANKLIST_STAGE,
+        {"$unwind": "$rankList"},
+        {"$match": {"rankList.song": {"$ne": None}}},
+        {"$addFields": {"scoreInt": SCORE_EXPR}},
+        {"$group": {
+            "_id": "$rankList.song",
+            "scoreSum": {"$sum": "$scoreInt"},
+            "votes": {"$sum": 1},
+            "sCount": {"$sum": {"$cond": [{"$eq": ["$scoreInt", 5]}, 1, 0]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "kind": "song",
+            "code": {"$toInt": "$_id"},
+            "scoreSum": 1,
+            "votes": 1,
+            "sCount": 1,
+            "avg": {"$divide": ["$scoreSum", "$votes"]},
+        }},
+    ]
+
+
+def live_category_stats_pipeline():
+    return [
+        RANKLIST_STAGE,
+        {"$unwind": "$rankList"},
+        {"$match": {"rankList.song": {"$ne": None}}},
+        # primero por ranking, para contar rankings sin $addToSet
+        {"$group": {
+            "_id": {"r": "$_id", "c": "$categoryCode"},
+            "scoreSum": {"$sum": SCORE_EXPR},
+            "placements": {"$sum": 1},
+        }},
+        {"$group": {
+            "_id": "$_id.c",
+            "scoreSum": {"$sum": "$scoreSum"},
+            "placements": {"$sum": "$placements"},
+            "rankings": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0,
+            "kind": "category",
+            "code": "$_id",
+            "scoreSum": 1,
+            "placements": 1,
+            "rankings": 1,
+            "avg": {"$divide": ["$scoreSum", "$placements"]},
+        }},
+    ]
+
+
+def live_overview():
+    rankings_col = get_collection("ranking")
+    placements = list(rankings_col.aggregate([
+        RANKLIST_STAGE,
+        {"$project": {"n": {"$size": {"$filter": {
+            "input": {"$ifNull": ["$rankList", []]},
+            "cond": {"$ne": ["$$this.song", None]},
+        }}}}},
+        {"$group": {"_id": None, "total": {"$sum": "$n"}}},
+    ]))
+    return {
+        "kind": "global",
+        "code": 0,
+        "rankings": rankings_col.count_documents({}),
+        "placements": int(placements[0]["total"]) if placements else 0,
+    }
+
+
+# Todo lo anterior en una sola pasada por ranking: un $unwind compartido y el
+# score normalizado una vez, y un $facet con global / canciones / categorías.
+# Sale un único documento, así que está sujeto al límite de 16 MB de BSON
+# (del orden de 10^5 canciones con placements); si se pasa, se vuelve a los
+# pipelines separados.
+
+BSON_TOO_LARGE_CODES = {10334, 17419, 4568}
+
+LIVE_FACET_PIPELINE = [
+    RANKLIST_STAGE,
+    {"$project": {
+        "categoryCode": 1,
+        "rankList": {"$map": {
+            "input": {"$filter": {
+                "input": {"$ifNull": ["$rankList", []]},
+                "cond": {"$ne": ["$$this.song", None]},
+            }},
+            "in": {"song": "$$this.song", "score": {"$toInt": {"$ifNull": ["$$this.score", 0]}}},
+        }},
+    }},
+    # i es null en los rankings vacíos (que también cuentan en global) y 0 en
+    # la primera posición de cada ranking (para contar rankings sin $addToSet)
+    {"$unwind": {"path": "$rankList", "includeArrayIndex": "i", "preserveNullAndEmptyArrays": True}},
+    {"$facet": {
+        "global": [
+            {"$group": {
+                "_id": None,
+                "rankings": {"$sum": {"$cond": [{"$in": ["$i", [None, 0]]}, 1, 0]}},
+                "placements": {"$sum": {"$cond": [{"$ne": ["$i", None]}, 1, 0]}},
+            }},
+            {"$project": {"_id": 0, "kind": "global", "code": {"$literal": 0}, "rankings": 1, "placements": 1}},
+        ],
+        "songs": [
+            {"$match": {"i": {"$ne": None}}},
+            {"$group": {
+                "_id": "$rankList.song",
+                "scoreSum": {"$sum": "$rankList.score"},
+                "votes": {"$sum": 1},
+                "sCount": {"$sum": {"$cond": [{"$eq": ["$rankList.score", 5]}, 1, 0]}},
+            }},
+            {"$project": {
+                "_id": 0,
+                "kind": "song",
+                "code": {"$toInt": "$_id"},
+                "scoreSum": 1,
+                "votes": 1,
+                "sCount": 1,
+                "avg": {"$divide": ["$scoreSum", "$votes"]},
+            }},
+        ],
+        "categories": [
+            {"$match": {"i": {"$ne": None}}},
+            {"$group": {
+                "_id": "$categoryCode",
+                "scoreSum": {"$sum": "$rankList.score"},
+                "placements": {"$sum": 1},
+                "rankings": {"$sum": {"$cond": [{"$eq": ["$i", 0]}, 1, 0]}},
+            }},
+            {"$project": {
+                "_id": 0,
+                "kind": "category",
+                "code": "$_id",
+                "scoreSum": 1,
+                "placements": 1,
+                "rankings": 1,
+                "avg": {"$divide": ["$scoreSum", "$placements"]},
+            }},
+        ],
+    }},
+]
+
+# Del documento del $facet a una fila por entrada del snapshot
+FACET_TO_ROWS = [
+    {"$project": {"rows": {"$concatArrays": [
+        {"$cond": [
+            {"$gt": [{"$size": "$global"}, 0]},
+            "$global",
+            [{"kind": "global", "code": 0, "rankings": 0, "placements": 0}],
+        ]},
+        "$songs",
+        "$categories",
+    ]}}},
+    {"$unwind": "$rows"},
+    {"$replaceRoot": {"newRoot": "$rows"}},
+]
+
+
+def _too_large(error):
+    return error.code in BSON_TOO_LARGE_CODES
+
+
+def live_stats_separate():
+    """Las cuatro pasadas de siempre (overview, placements, canciones, categorías)."""
+    db = get_db()
+    rows = [live_overview()]
+    for pipeline in (live_song_stats_pipeline(), live_category_stats_pipeline()):
+        rows.extend(db["ranking"].aggregate(pipeline, allowDiskUse=True))
+    return rows
+
+
+def live_stats():
+    """Todas las filas del snapshot calculadas desde ranking (una pasada si cabe)."""
+    try:
+        return list(get_db()["ranking"].aggregate(LIVE_FACET_PIPELINE + FACET_TO_ROWS, allowDiskUse=True))
+    except OperationFailure as e:
+        if not _too_large(e):
+            raise
+        return live_stats_separate()
+
+
+def rebuild_snapshot():
+    """Recalcula stats_snapshot desde ranking y lo sustituye de golpe."""
+    db = get_db()
+    tmp_name = f"{SNAPSHOT_COLLECTION}_rebuild_{uuid.uuid4().hex[:8]}"
+    tmp = db[tmp_name]
+    tmp.create_indexes(SNAPSHOT_INDEXES)
+
+    merge = {"$merge": {"into": tmp_name, "on": ["kind", "code"], "whenMatched": "replace"}}
+    try:
+        db["ranking"].aggregate(LIVE_FACET_PIPELINE + FACET_TO_ROWS + [merge], allowDiskUse=True)
+    except OperationFailure as e:
+        if not _too_large(e):
+            raise
+        tmp.delete_many({})
+        db["ranking"].aggregate(live_song_stats_pipeline() + [merge], allowDiskUse=True)
+        db["ranking"].aggregate(live_category_stats_pipeline() + [merge], allowDiskUse=True)
+        tmp.insert_one(live_overview())
+
+    tmp.rename(SNAPSHOT_COLLECTION, dropTarget=True)
+    return db[SNAPSHOT_COLLECTION].estimated_document_count()
+
+
+def check_snapshot():
+    """Compara el snapshot con lo que dan los pipelines sobre ranking.
+
+    Devuelve una lista de (kind, code, campo, snapshot, real).
+    """
+    fields = {
+        "global": ("rankings", "placements"),
+        "song": ("scoreSum", "votes", "sCount"),
+        "category": ("scoreSum", "placements", "rankings"),
+    }
+
+    live = {(doc["kind"], doc["code"]): doc for doc in live_stats()}
+
+    stored = {(doc["kind"], doc["code"]): doc for doc in _snapshot_col().find({}, {"_id": 0})}
+
+    mismatches = []
+    for key in sorted(set(live) | set(stored), key=lambda k: (k[0], k[1] if k[1] is not None else -1)):
+        kind, code = key
+        for field in fields.get(kind, ()):
+            expected = int((live.get(key) or {}).get(field, 0))
+            actual = int((stored.get(key) or {}).get(field, 0))
+            if expected != actual:
+                mismatches.append((kind, code, field, actual, expected))
+    return mismatches
@@ -0,0 +1,153 @@
+from bisect import bisect
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from django.conf import settings
+
+from songReviews.tierlists import TIERS
+
+# Datos sintéticos para benchmarks (manage.py seed_synthetic / bench).
+# Todo sale de un random.Random(seed), así que con la misma semilla y los
+# mismos tamaños se generan exactamente los mismos documentos.
+#
+# Solo se escribe en bases de datos cuyo nombre acaba en BENCH_DB_SUFFIX:
+#   MONGO_DB_NAME=songreviews_bench python manage.py seed_synthetic
+
+BENCH_DB_SUFFIX = "_bench"
+
+DEFAULT_SIZES = {
+    "songs": 100_000,
+    "categories": 200,
+    "users": 20_000,
+    "reviews": 1_000_000,
+    "tierlists": 100_000,
+}
+
+WORDS = (
+    "love night fire dream heart blue gold summer rain city dance light wild "
+    "lost home star river ghost money angel paper shadow sugar electric young"
+).split()
+
+BASE_DATE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def bench_db_name():
+    return settings.DATABASES["mongodb"]["NAME"]
+
+
+def is_bench_db():
+    return bench_db_name().endswith(BENCH_DB_SUFFIX)
+
+
+class Zipf:
+    """Elige índices 0..n-1 con probabilidad proporcional a 1 / (rango ** skew).
+
+    El orden de popularidad se baraja con el mismo rng, para que las canciones
+    populares no sean siempre los codes más bajos. skew 0 = uniforme.
+    """
+
+    def __init__(self, n, skew, rng):
+        self.rng = rng
+        self.order = list(range(n))
+        rng.shuffle(self.order)
+        self.cumulative = list(accumulate(1.0 / (rank ** skew) for rank in range(1, n + 1)))
+
+    def __call__(self):
+        i = bisect(self.cumulative, self.rng.random() * self.cumulative[-1])
+        return self.order[min(i, len(self.order) - 1)]
+
+    def distinct(self, k, limit=None):
+        """k índices distintos (con un tope de intentos para no colgarse con skew alto)."""
+        chosen = set()
+        attempts = limit or k * 20
+        while len(chosen) < k and attempts:
+            chosen.add(self())
+            attempts -= 1
+        return list(chosen)
+
+
+def _title(rng):
+    return " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 4)))
+
+
+def generate_categories(rng, count):
+    for code in range(1, count + 1):
+        yield {
+            "code": code,
+            "name": f"{_title(rng)} #{code}",
+            "description": f"Synthetic category {code}",
+            "logo": f"https://picsum.photos/seed/cat{code}/200",
+            "songsVersion": 0,
+        }
+
+
+def generate_songs(rng, count, categories, skew):
+    """Canciones con code 1..count; cada una en 1-3 categorías (las populares tienen más)."""
+    artists = [f"{_title(rng)} {i}" for i in range(max(count // 10, 1))]
+    pick_artist = Zipf(len(artists), skew, rng)
+    pick_category = Zipf(categories, skew, rng)
+
+    for code in range(1, count + 1):
+        yield {
+            "code": code,
+            "name": _title(rng),
+            "artist": artists[pick_artist()],
+            "duration": rng.randint(90, 420),
+            "artwork": f"https://picsum.photos/seed/song{code}/300",
+            "releaseDate": (BASE_DATE - timedelta(days=rng.randint(0, 40 * 365))).strftime("%Y-%m-%d"),
+            "categories": sorted(c + 1 for c in pick_category.distinct(rng.randint(1, 3))),
+        }
+
+
+def _spread(total, buckets, rng):
+    """Reparte total entre buckets de forma desigual (algunos usuarios hacen mucho más)."""
+    weights = [rng.paretovariate(1.5) for _ in range(buckets)]
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    for i in range(total - sum(counts)):
+        counts[i % buckets] += 1
+    return counts
+
+
+def user_name(i):
+    return f"user{i:06d}"
+
+
+def generate_reviews(rng, count, users, songs, skew):
+    """Como mucho una review por (usuario, canción), igual que add_review."""
+    pick_song = Zipf(songs, skew, rng)
+    for u, n in enumerate(_spread(count, users, rng)):
+        username = user_name(u)
+        for song in pick_song.distinct(min(n, songs)):
+            yield {
+                "user": username,
+                "songCode": song + 1,
+                "reviewDate": BASE_DATE - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                "rating": rng.choices((1, 2, 3, 4, 5), weights=(1, 2, 4, 6, 4))[0],
+                "comments": " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 20))),
+            }
+
+
+def generate_tierlists(rng, count, users, members, skew):
+    """Una tierlist por (usuario, categoría), en el formato de tierlists.py."""
+    categories = sorted(code for code, songs in members.items() if songs)
+    if not categories:
+        return
+    pick_category = Zipf(len(categories), skew, rng)
+
+    for u, n in enumerate(_spread(count, users, rng)):
+        username = user_name(u)
+        for c in pick_category.distinct(min(n, len(categories))):
+            code = categories[c]
+            songs = members[code]
+            placed = rng.sample(songs, min(len(songs), rng.randint(5, 40)))
+            tiers = {tier: [] for tier in TIERS}
+            for song in placed:
+                tiers[rng.choice(TIERS)].append(song)
+            yield {
+                "user": username,
+                "categoryCode": code,
+                "rankingDate": BASE_DATE - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                "tiers": tiers,
+                "version": 1,
+            }
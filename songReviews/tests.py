@@ -1,3 +1,706 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase
+
+from songReviews import (
+    catalog, counters, importer, populate_musicbrainz as mb, ratings, reviews, search, stats_snapshot, views,
+)
+from songReviews.mongo_pool import get_collection, get_db
+from songReviews.songs import song_cards_page
+from songReviews.tierlists import (
+    VersionConflict, apply_moves, empty_tiers, move_songs, rank_list_of, save_tiers, tiers_of,
+)
+
+# Servidor HTTP local que hace de MusicBrainz y de Cover Art Archive a la vez
+# (mismo host, así que comparten limitador; se le da un límite alto).
+
+ARTIST = {"artists": [{"id": "artist-1"}]}
+RELEASE_GROUPS = {"release-groups": [
+    {"id": "rg-1", "title": "First", "first-release-date": "2020-01-01", "primary-type": "Album"},
+]}
+RELEASES = {"releases": [{"id": "rel-a"}, {"id": "rel-b"}, {"id": "rel-c"}]}
+TRACKS = {
+    "artist-credit": [{"name": "Artist"}],
+    "media": [{"tracks": [
+        {"title": "One", "length": 180000},
+        {"title": "Two", "length": None, "artist-credit": [{"name": "Guest"}]},
+    ]}],
+}
+COVERS = {
+    "rel-b": {"images": [{"front": False, "image": "http://img/b-back"}, {"front": True, "image": "http://img/b"}]},
+    "rel-c": {"images": [{"front": True, "image": "http://img/c"}]},
+}
+CAA_DELAY = 0.2
+ETAG = '"rg-v1"'
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        with server.lock:
+            server.hits.append(url.path)
+            fail = server.fail_next.pop(url.path, None)
+
+        if fail:
+            self._send(503, {}, {"Retry-After": str(fail)})
+        elif url.path == "/ws/2/artist":
+            self._send(200, ARTIST if "Known" in query["query"][0] else {"artists": []})
+        elif url.path == "/ws/2/release-group":
+            if self.headers.get("If-None-Match") == ETAG:
+                self._send(304, None)
+            else:
+                self._send(200, RELEASE_GROUPS, {"ETag": ETAG})
+        elif url.path == "/ws/2/release":
+            self._send(200, RELEASES)
+        elif url.path.startswith("/ws/2/release/"):
+            self._send(200, TRACKS)
+        elif url.path.startswith("/release/"):
+            time.sleep(CAA_DELAY)
+            release = url.path.rsplit("/", 1)[-1]
+            if release in COVERS:
+                self._send(200, COVERS[release])
+            else:
+                self._send(404, {})
+        else:
+            self._send(404, {})
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeMusicBrainzTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeHandler)
+        cls.server.lock = threading.Lock()
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{cls.server.server_port}"
+        cls.patches = [
+            mock.patch.object(mb, "MB_BASE", f"{base}/ws/2"),
+            mock.patch.object(mb, "CAA_BASE", base),
+        ]
+        for patch in cls.patches:
+            patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        for patch in cls.patches:
+            patch.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.hits = []
+        self.server.fail_next = {}
+        self.use_engine(mb.FetchEngine(host_limits={"127.0.0.1": (100.0, 10)}))
+
+    def use_engine(self, engine):
+        patch = mock.patch.object(mb, "engine", engine)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(engine.close)
+        return engine
+
+    def test_sync_wrappers_keep_signatures(self):
+        self.assertEqual(mb.find_artist_mbid("Known"), "artist-1")
+        self.assertIsNone(mb.find_artist_mbid("Nobody"))
+        self.assertEqual(mb.get_release_groups("artist-1")[0]["id"], "rg-1")
+        self.assertEqual(mb.mb_get(f"{mb.MB_BASE}/release-group"), RELEASE_GROUPS)
+        self.assertEqual(mb.caa_front_image_url("rel-b"), "http://img/b")
+        self.assertIsNone(mb.caa_front_image_url("rel-a"))
+        self.assertEqual(mb.pick_release_with_cover("rg-1"), {"id": "rel-b"})
+        self.assertEqual(mb.get_tracks_from_release("rel-b"), [
+            {"title": "One", "length_ms": 180000, "artist": "Artist"},
+            {"title": "Two", "length_ms": None, "artist": "Guest"},
+        ])
+
+    def test_cover_probes_run_concurrently(self):
+        started = time.monotonic()
+        release, cover_url = mb.run(mb.pick_release_with_cover_async("rg-1"))
+        elapsed = time.monotonic() - started
+
+        # el primero con portada en el orden de MusicBrainz, con su URL
+        self.assertEqual((release, cover_url), ({"id": "rel-b"}, "http://img/b"))
+        self.assertEqual(sum(hit.startswith("/release/") for hit in self.server.hits), 3)
+        self.assertLess(elapsed, 2 * CAA_DELAY)
+
+    def test_retry_after_is_honoured(self):
+        self.server.fail_next["/ws/2/release-group"] = 0.3
+        started = time.monotonic()
+        self.assertEqual(mb.get_release_groups("artist-1")[0]["id"], "rg-1")
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(self.server.hits.count("/ws/2/release-group"), 2)
+
+    def test_host_limit_spaces_requests(self):
+        self.use_engine(mb.FetchEngine(host_limits={"127.0.0.1": (10.0, 1)}))
+
+        async def fetch_all():
+            await asyncio.gather(*(mb.get_release_groups_async("artist-1") for _ in range(4)))
+
+        started = time.monotonic()
+        mb.run(fetch_all())
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+    def test_fetch_catalog(self):
+        catalog = mb.run(mb.fetch_catalog(["Known", "Nobody"], 5))
+
+        self.assertEqual([artist for artist, _ in catalog], ["Known", "Nobody"])
+        [release] = catalog[0][1]
+        self.assertEqual(release["release_mbid"], "rel-b")
+        self.assertEqual(release["cover_url"], "http://img/b")
+        self.assertEqual(release["rg_first_release"], "2020-01-01")
+        self.assertEqual(len(release["tracks"]), 2)
+        self.assertEqual(catalog[1][1], [])
+
+    def test_offline_run_uses_only_the_cache(self):
+        cache = mb.ResponseCache(f"{tempfile.mkdtemp()}/musicbrainz.sqlite3")
+        self.use_engine(mb.FetchEngine(host_limits={"127.0.0.1": (100.0, 10)}, cache=cache))
+        online = mb.run(mb.fetch_catalog(["Known"], 5))
+        hits = len(self.server.hits)
+
+        offline = mb.FetchEngine(cache=mb.ResponseCache(cache.path), mode="offline")
+        self.use_engine(offline)
+        self.assertEqual(mb.run(mb.fetch_catalog(["Known", "Unseen"], 5)), online + [("Unseen", [])])
+        self.assertEqual(len(self.server.hits), hits)
+
+    def test_refresh_revalidates_with_etag(self):
+        cache = mb.ResponseCache(f"{tempfile.mkdtemp()}/musicbrainz.sqlite3")
+        self.use_engine(mb.FetchEngine(host_limits={"127.0.0.1": (100.0, 10)}, cache=cache))
+        mb.get_release_groups("artist-1")
+        mb.get_release_groups("artist-1")
+        self.assertEqual(self.server.hits.count("/ws/2/release-group"), 1)
+
+        refresh = mb.FetchEngine(
+            host_limits={"127.0.0.1": (100.0, 10)}, cache=mb.ResponseCache(cache.path), mode="refresh",
+        )
+        self.use_engine(refresh)
+        self.assertEqual(mb.get_release_groups("artist-1")[0]["id"], "rg-1")
+        self.assertEqual(self.server.hits.count("/ws/2/release-group"), 2)
+
+
+def track(name, artist="Artist", release="rel-1"):
+    return {"name": name, "artist": artist, "release_mbid": release, "duration": 1, "categories": []}
+
+
+class UpsertReleaseTracksTests(SimpleTestCase):
+    databases = {"mongodb"}
+
+    def setUp(self):
+        self.db = get_db()
+        for name in ("songs", "counters"):
+            self.db[name].drop()
+            self.addCleanup(self.db[name].drop)
+        patch = mock.patch.object(counters, "_seeded", set())
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        mb.ensure_track_index(self.db["songs"])
+        self.db["songs"].insert_one({"code": 10, "name": "Old", "artist": "Someone"})
+
+    def codes(self):
+        return sorted(doc["code"] for doc in self.db["songs"].find({"release_mbid": "rel-1"}))
+
+    def test_only_new_tracks_get_codes(self):
+        self.assertEqual(mb.upsert_release_tracks(self.db, [track("One"), track("Two"), track("One")]), (2, 0))
+        self.assertEqual(self.codes(), [11, 12])
+
+        self.assertEqual(mb.upsert_release_tracks(self.db, [track("One"), track("Two"), track("Three")]), (1, 2))
+        self.assertEqual(self.codes(), [11, 12, 13])
+
+        # todo repetido: no se reservan códigos
+        self.assertEqual(mb.upsert_release_tracks(self.db, [track("Three")]), (0, 1))
+        self.assertEqual(self.db["counters"].find_one({"_id": "songs"})["seq"], 13)
+
+
+class MoveSongsTests(SimpleTestCase):
+    """move_songs escribe con _moves_pipeline y las deltas de stats salen de apply_moves: tienen que coincidir."""
+
+    databases = {"mongodb"}
+
+    CASES = [
+        ("index beyond length", {"S": [1, 2], "A": [3]}, [(4, "S", 10), (3, "S", 7)]),
+        ("same-tier reorder", {"S": [1, 2, 3]}, [(1, "S", 2), (3, "S", 0)]),
+        ("across tiers", {"S": [1, 2], "B": [5]}, [(2, "B", 0), (5, "A", None), (1, None, None)]),
+        ("unknown song removed", {"C": [7]}, [(8, None, None), (7, "D", 3)]),
+    ]
+
+    def setUp(self):
+        self.ranking = get_collection("ranking")
+        self.ranking.drop()
+        self.addCleanup(self.ranking.drop)
+
+    def stored(self, user="u"):
+        return tiers_of(self.ranking.find_one({"user": user, "categoryCode": 1}))
+
+    def check(self, doc, moves):
+        self.ranking.delete_many({})
+        self.ranking.insert_one({"user": "u", "categoryCode": 1, **doc})
+        expected = apply_moves(tiers_of(doc), moves)
+
+        previous, tiers, version = move_songs("u", 1, moves, 1, doc.get("version", 0))
+        self.assertEqual(tiers, expected)
+        self.assertEqual(self.stored(), expected)
+        self.assertEqual(version, doc.get("version", 0) + 1)
+        self.assertEqual(self.ranking.count_documents({}), 1)
+
+    def test_pipeline_matches_apply_moves(self):
+        for name, tiers, moves in self.CASES:
+            with self.subTest(name):
+                self.check({"tiers": {**empty_tiers(), **tiers}, "version": 3}, moves)
+
+    def test_pipeline_matches_apply_moves_on_legacy_rank_list(self):
+        for name, tiers, moves in self.CASES:
+            rank_list = [
+                {"song": str(code), "tier": tier, "score": 0}
+                for tier, codes in tiers.items()
+                for code in codes
+            ]
+            with self.subTest(name):
+                self.check({"rankList": rank_list}, moves)
+                self.assertNotIn("rankList", self.ranking.find_one())
+
+    def test_new_ranking(self):
+        self.assertEqual(move_songs("u", 1, [(1, "A", None)], 1, 0), (None, {**empty_tiers(), "A": [1]}, 1))
+        self.assertEqual(self.stored(), {**empty_tiers(), "A": [1]})
+
+    def test_only_removals_without_ranking_is_a_noop(self):
+        self.assertIsNone(move_songs("u", 1, [(1, None, None)], 1, 0))
+        self.assertIsNone(move_songs("u", 1, [(1, None, None)], 1))
+        self.assertEqual(self.ranking.count_documents({}), 0)
+
+    def test_stale_version_does_not_create_a_second_ranking(self):
+        self.ranking.insert_one({"user": "u", "categoryCode": 1, "tiers": {"S": [1]}, "version": 2})
+        for stale in (0, 1, 5):
+            with self.subTest(stale), self.assertRaises(VersionConflict):
+                move_songs("u", 1, [(2, "A", None)], 1, stale)
+        self.assertEqual(self.ranking.count_documents({}), 1)
+        self.assertEqual(self.stored()["S"], [1])
+
+
+def csv_row(**fields):
+    return {"code": "", "name": "Song", "artist": "Artist", "duration": "180", "artwork": "",
+            "releaseDate": "2020-01-01", "categories": "", **fields}
+
+
+class ParseRowTests(SimpleTestCase):
+    def test_valid_row(self):
+        doc = importer.parse_row(csv_row(code="7", categories=" 3, 4,"))
+        self.assertEqual(doc["code"], 7)
+        self.assertEqual(doc["categories"], [3, 4])
+
+    def test_empty_code_and_categories(self):
+        doc = importer.parse_row(csv_row())
+        self.assertIsNone(doc["code"])
+        self.assertEqual(doc["categories"], [])
+
+    def test_invalid_rows(self):
+        cases = [
+            ("code", csv_row(code="0")),
+            ("code", csv_row(code="x")),
+            ("name", csv_row(name=" ")),
+            ("duration", csv_row(duration="-1")),
+            ("artwork", csv_row(artwork="ftp://x")),
+            ("categories", csv_row(categories="3,abc")),
+            ("categories", csv_row(categories="-1")),
+            ("too many columns", {**csv_row(), None: ["extra"]}),
+        ]
+        for reason, row in cases:
+            with self.subTest(row=row), self.assertRaisesRegex(importer.RowError, reason):
+                importer.parse_row(row)
+
+
+class ImportSongsCsvTests(SimpleTestCase):
+    databases = {"mongodb"}
+
+    HEADER = "code,name,artist,duration,artwork,releaseDate,categories\n"
+
+    def setUp(self):
+        self.db = get_db()
+        for name in ("songs", "counters", "categories"):
+            self.db[name].drop()
+            self.addCleanup(self.db[name].drop)
+        patch = mock.patch.object(counters, "_seeded", set())
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def run_import(self, lines, **kwargs):
+        data = (self.HEADER + "".join(line + "\n" for line in lines)).encode()
+        return importer.import_songs_csv(io.BytesIO(data), **kwargs)
+
+    def test_repeated_code_in_a_batch_keeps_the_last_row(self):
+        result = self.run_import([
+            "5,First,A,100,,2020-01-01,1",
+            ",New,B,100,,2020-01-01,",
+            "5,Second,A,100,,2020-01-01,2",
+        ])
+        self.assertEqual((result.rows, result.inserted, result.updated, result.failed), (3, 2, 1, 0))
+        self.assertEqual(self.db["songs"].count_documents({"code": 5}), 1)
+        song = self.db["songs"].find_one({"code": 5})
+        self.assertEqual((song["name"], song["categories"]), ("Second", [2]))
+        # la fila sin code no puede llevarse el 5
+        self.assertEqual(self.db["songs"].find_one({"name": "New"})["code"], 6)
+
+    def test_invalid_row_is_reported_and_skipped(self):
+        result = self.run_import(["5,First,A,100,,2020-01-01,\"3,abc\"", "6,Other,A,100,,2020-01-01,3"])
+        self.assertEqual((result.inserted, result.failed), (1, 1))
+        self.assertEqual(result.errors[0]["row"], 2)
+        self.assertIn("categories", result.errors[0]["reason"])
+
+
+class ReviewsPageTests(SimpleTestCase):
+    databases = {"mongodb"}
+
+    def setUp(self):
+        self.reviews = get_collection("reviews")
+        self.reviews.drop()
+        self.addCleanup(self.reviews.drop)
+
+    def test_reviews_without_date_come_last(self):
+        dated = [
+            {"songCode": 1, "user": f"u{day}", "reviewDate": datetime(2024, 1, day)}
+            for day in (1, 2, 2, 3)
+        ]
+        legacy = [{"songCode": 1, "user": f"old{i}"} for i in range(3)]
+        self.reviews.insert_many(dated + legacy + [{"songCode": 2, "user": "other"}])
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = reviews.reviews_page(1, cursor=cursor, limit=2)
+            seen += [doc["user"] for doc in page]
+            if cursor is None:
+                break
+        self.assertEqual(seen, ["u3", "u2", "u2", "u1", "old2", "old1", "old0"])
+
+
+class SongCardsPageTests(SimpleTestCase):
+    databases = {"mongodb"}
+
+    def setUp(self):
+        self.songs = get_collection("songs")
+        self.songs.drop()
+        self.addCleanup(self.songs.drop)
+        self.songs.insert_many([{"code": code, "name": f"Song {code}"} for code in (1, 2, 3)])
+        self.songs.insert_one({"code": None, "name": "Broken"})
+
+    def test_total_skips_songs_without_code(self):
+        cards, next_cursor, total = song_cards_page(limit=2)
+        self.assertEqual([card["code"] for card in cards], [1, 2])
+        self.assertEqual((next_cursor, total), ("2", 3))
+
+    def test_negative_cursor_is_rejected(self):
+        for q in ("", "song"):
+            with self.subTest(q=q), self.assertRaises(ValueError):
+                song_cards_page(q, cursor="-30")
+
+
+class CategorySongsEtagTests(SimpleTestCase):
+    """Sacar una canción de una categoría desde el CSV tiene que cambiar el ETag de esa categoría."""
+
+    databases = {"mongodb"}
+
+    def setUp(self):
+        self.db = get_db()
+        for name in ("songs", "counters", "categories"):
+            self.db[name].drop()
+            self.addCleanup(self.db[name].drop)
+        # catálogo nuevo para que no se quede con versiones de otro test
+        for patch in (mock.patch.object(counters, "_seeded", set()), mock.patch.object(catalog, "_catalog", None)):
+            patch.start()
+            self.addCleanup(patch.stop)
+        caches["default"].clear()
+
+        self.db["categories"].insert_many([{"code": 1, "name": "One"}, {"code": 2, "name": "Two"}])
+        self.db["songs"].insert_many([
+            {"code": 5, "name": "Five", "artist": "A", "categories": [1]},
+            {"code": 6, "name": "Six", "artist": "A", "categories": [1]},
+        ])
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return views.category_songs(RequestFactory().get("/", **headers), 1)
+
+    def test_song_moved_out_by_import_changes_the_etag(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([s["code"] for s in json.loads(first.content)["songs"]], [5, 6])
+        self.assertEqual(self.get(first["ETag"]).status_code, 304)
+
+        data = ImportSongsCsvTests.HEADER + "5,Five,A,100,,2020-01-01,2\n"
+        result = importer.import_songs_csv(io.BytesIO(data.encode()))
+        self.assertEqual((result.updated, result.failed), (1, 0))
+
+        second = self.get(first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual([s["code"] for s in json.loads(second.content)["songs"]], [6])
+
+
+class MoveTierlistSongsViewTests(SimpleTestCase):
+    databases = {"mongodb"}
+
+    def setUp(self):
+        self.db = get_db()
+        for name in ("songs", "counters", "categories", "ranking"):
+            self.db[name].drop()
+            self.addCleanup(self.db[name].drop)
+        patch = mock.patch.object(catalog, "_catalog", None)
+        patch.start()
+        self.addCleanup(patch.stop)
+        caches["default"].clear()
+
+        self.db["categories"].insert_one({"code": 1, "name": "One"})
+        self.db["songs"].insert_many([
+            {"code": 5, "name": "Five", "artist": "A", "categories": [1]},
+            {"code": 6, "name": "Six", "artist": "A", "categories": [2]},
+        ])
+
+    def post(self, category_code, ops):
+        body = json.dumps({"version": 0, "ops": ops})
+        request = RequestFactory().post("/", body, content_type="application/json")
+        request.user = mock.Mock(is_authenticated=True, username="u")
+        return views.move_tierlist_songs(request, category_code)
+
+    def test_unknown_category(self):
+        self.assertEqual(self.post(9, [{"song": 5, "tier": "S"}]).status_code, 404)
+
+    def test_song_from_another_category_is_rejected(self):
+        response = self.post(1, [{"song": 5, "tier": "S"}, {"song": 6, "tier": "A"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.db["ranking"].count_documents({}), 0)
+
+    def test_removing_a_song_no_longer_in_the_category_is_allowed(self):
+        self.assertEqual(self.post(1, [{"song": 6, "tier": None}]).status_code, 204)
+
+
+class SaveTiersTests(SimpleTestCase):
+    """save_tiers (_write_tierlist): comprobación de versión sin upsert."""
+
+    databases = {"mongodb"}
+
+    def setUp(self):
+        self.ranking = get_collection("ranking")
+        self.ranking.drop()
+        self.addCleanup(self.ranking.drop)
+
+    def stored(self, user="u"):
+        return self.ranking.find_one({"user": user, "categoryCode": 1})
+
+    def test_new_ranking(self):
+        self.assertEqual(save_tiers("u", 1, {"S": [1]}, 1, 0), (None, 1))
+        self.assertEqual((self.stored()["tiers"]["S"], self.stored()["version"]), ([1], 1))
+
+    def test_matching_version_updates(self):
+        save_tiers("u", 1, {"S": [1]}, 1, 0)
+        previous, version = save_tiers("u", 1, {"A": [2]}, 2, 1)
+        self.assertEqual((previous["tiers"]["S"], version), ([1], 2))
+        self.assertEqual(self.stored()["tiers"], {**empty_tiers(), "A": [2]})
+        self.assertEqual(self.ranking.count_documents({}), 1)
+
+    def test_stale_version_conflicts(self):
+        self.ranking.insert_one({"user": "u", "categoryCode": 1, "tiers": {"S": [1]}, "version": 3})
+        for stale in (1, 2, 4):
+            with self.subTest(stale), self.assertRaises(VersionConflict):
+                save_tiers("u", 1, {"A": [2]}, 2, stale)
+        self.assertEqual(self.stored()["version"], 3)
+
+    def test_version_zero_with_an_existing_ranking_conflicts(self):
+        save_tiers("u", 1, {"S": [1]}, 1, 0)
+        with self.assertRaises(VersionConflict):
+            save_tiers("u", 1, {"S": [2]}, 2, 0)
+        self.assertEqual(self.ranking.count_documents({}), 1)
+        self.assertEqual(self.stored()["tiers"]["S"], [1])
+
+    def test_legacy_ranking_without_version(self):
+        rank_list = [{"song": "3", "tier": "S", "score": 5}]
+        self.ranking.insert_one({"user": "u", "categoryCode": 1, "rankList": rank_list})
+        previous, version = save_tiers("u", 1, {"B": [3]}, 2, 0)
+        self.assertIn("rankList", previous)
+        self.assertEqual(version, 1)
+        stored = self.stored()
+        self.assertNotIn("rankList", stored)
+        self.assertEqual((stored["tiers"]["B"], stored["version"]), ([3], 1))
+
+        # ya tiene versión: 0 deja de valer
+        with self.assertRaises(VersionConflict):
+            save_tiers("u", 1, {"C": [3]}, 3, 0)
+
+    def test_without_expected_version_last_write_wins(self):
+        self.assertEqual(save_tiers("u", 1, {"S": [1]}, 1), (None, 1))
+        self.ranking.update_one({"user": "u"}, {"$set": {"version": 7}})
+        previous, version = save_tiers("u", 1, {"A": [2]}, 2)
+        self.assertEqual((previous["version"], version), (7, 8))
+        self.assertEqual(self.stored()["tiers"]["A"], [2])
+        self.assertEqual(self.ranking.count_documents({}), 1)
+
+
+def placed(**tiers):
+    return rank_list_of({"tiers": tiers})
+
+
+class TierlistDeltasTests(SimpleTestCase):
+    def test_new_ranking(self):
+        songs, category, overview = stats_snapshot.tierlist_deltas(None, placed(S=[1], B=[2]), True)
+        self.assertEqual(songs, {1: (5, 1, 1), 2: (3, 1, 0)})
+        self.assertEqual(category, (8, 2, 1))
+        self.assertEqual(overview, (1, 2))
+
+    def test_resave_without_changes(self):
+        tiers = placed(S=[1], B=[2])
+        self.assertEqual(stats_snapshot.tierlist_deltas(tiers, tiers, False), ({}, (0, 0, 0), (0, 0)))
+
+    def test_move_across_tiers(self):
+        songs, category, overview = stats_snapshot.tierlist_deltas(placed(S=[1], B=[2]), placed(A=[1, 2]), False)
+        self.assertEqual(songs, {1: (-1, 0, -1), 2: (1, 0, 0)})
+        self.assertEqual(category, (0, 0, 0))
+        self.assertEqual(overview, (0, 0))
+
+    def test_removing_the_last_placement(self):
+        songs, category, overview = stats_snapshot.tierlist_deltas(placed(C=[1]), placed(), False)
+        self.assertEqual(songs, {1: (-2, -1, 0)})
+        # el ranking sigue existiendo (cuenta en global) pero ya no en la categoría
+        self.assertEqual(category, (-2, -1, -1))
+        self.assertEqual(overview, (0, -1))
+
+
+class ApplyTierlistChangeTests(SimpleTestCase):
+    """Los deltas aplicados a stats_snapshot tienen que dar lo mismo que recalcular desde ranking."""
+
+    databases = {"mongodb"}
+
+    def setUp(self):
+        self.db = get_db()
+        for name in ("ranking", stats_snapshot.SNAPSHOT_COLLECTION):
+            self.db[name].drop()
+            self.addCleanup(self.db[name].drop)
+
+    def save(self, user, category_code, **tiers):
+        # lo mismo que hace save_tierlist
+        previous, _ = save_tiers(user, category_code, tiers, 1)
+        stats_snapshot.apply_tierlist_change(
+            category_code,
+            rank_list_of(previous) if previous else None,
+            rank_list_of({"tiers": tiers}),
+            is_new=previous is None,
+        )
+
+    def snapshot(self, kind, code):
+        return self.db[stats_snapshot.SNAPSHOT_COLLECTION].find_one({"kind": kind, "code": code}, {"_id": 0})
+
+    def test_snapshot_matches_live_stats(self):
+        self.save("u1", 1, S=[1, 2])
+        self.save("u2", 1, A=[1])
+        self.save("u1", 1, B=[1], S=[3])
+        self.save("u2", 1)
+        self.save("u1", 2, C=[4])
+
+        self.assertEqual(stats_snapshot.check_snapshot(), [])
+        self.assertEqual(self.snapshot("global", 0), {"kind": "global", "code": 0, "rankings": 3, "placements": 3})
+        category = self.snapshot("category", 1)
+        self.assertEqual((category["scoreSum"], category["placements"], category["rankings"]), (8, 2, 1))
+        self.assertEqual(self.snapshot("song", 2)["votes"], 0)
+
+        live = {(row["kind"], row["code"]): row for row in stats_snapshot.live_stats()}
+        self.assertEqual(live[("song", 1)]["scoreSum"], self.snapshot("song", 1)["scoreSum"])
+
+
+class ReviewDeltaTests(SimpleTestCase):
+    def test_first_review(self):
+        self.assertEqual(ratings.review_delta(None, 4), (1, 4, {4: 1}))
+
+    def test_rating_change(self):
+        self.assertEqual(ratings.review_delta(4, 2), (0, -2, {4: -1, 2: 1}))
+
+    def test_unchanged_rating(self):
+        self.assertEqual(ratings.review_delta(3, 3), (0, 0, {}))
+
+
+class ApplyReviewTests(SimpleTestCase):
+    """El resumen mantenido con deltas tiene que coincidir con rebuild_summaries()."""
+
+    databases = {"mongodb"}
+
+    def setUp(self):
+        self.db = get_db()
+        for name in ("reviews", ratings.SUMMARY_COLLECTION):
+            self.db[name].drop()
+            self.addCleanup(self.db[name].drop)
+
+    def review(self, user, song_code, rating):
+        # lo mismo que hace add_review
+        previous = self.db["reviews"].find_one_and_update(
+            {"user": user, "songCode": song_code}, {"$set": {"rating": rating}}, upsert=True,
+        )
+        ratings.apply_review(song_code, previous.get("rating") if previous else None, rating)
+
+    def test_histogram_buckets(self):
+        self.review("a", 1, 5)
+        self.review("b", 1, 3)
+        self.review("a", 1, 4)
+        self.review("c", 1, 4)
+        self.review("c", 1, 4)
+
+        summary = ratings.get_summary(1)
+        self.assertEqual((summary["count"], summary["sum"], summary["avg"]), (3, 11, 11 / 3))
+        self.assertEqual(summary["hist"], {"1": 0, "2": 0, "3": 1, "4": 2, "5": 0})
+        self.assertEqual([row["count"] for row in ratings.histogram_rows(summary)], [0, 2, 1, 0, 0])
+
+    def test_matches_rebuild_summaries(self):
+        for user, song_code, rating in [("a", 1, 5), ("b", 1, 2), ("a", 1, 1), ("a", 2, 3), ("b", 2, 3)]:
+            self.review(user, song_code, rating)
+        incremental = {code: ratings.get_summary(code) for code in (1, 2)}
+
+        ratings.rebuild_summaries()
+        self.assertEqual({code: ratings.get_summary(code) for code in (1, 2)}, incremental)
+
+
+class InMemorySearchTests(SimpleTestCase):
+    databases = {"mongodb"}
+
+    def setUp(self):
+        self.db = get_db()
+        for name in ("songs", "counters", "categories"):
+            self.db[name].drop()
+            self.addCleanup(self.db[name].drop)
+        patch = mock.patch.object(catalog, "_catalog", None)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        self.db["songs"].insert_many([
+            {"code": 1, "name": "Despacito", "artist": "Luis Fonsi"},
+            {"code": 2, "name": "Malamente", "artist": "Rosalía"},
+        ])
+
+    def test_index_is_built_from_the_catalog(self):
+        backend = search.InMemorySearchBackend()
+        with mock.patch.object(search, "get_collection", side_effect=AssertionError("songs read twice")):
+            self.assertEqual(backend.search("rosa"), [2])
+
+            self.db["songs"].insert_one({"code": 3, "name": "Rosa", "artist": "X"})
+            catalog.invalidate_catalog(categories=False)
+            backend.invalidate()
+            self.assertEqual(backend.search("rosa"), [3, 2])
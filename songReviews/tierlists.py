@@ -0,0 +1,269 @@
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from songReviews.mongo_pool import get_async_collection, get_collection
+
+# Almacenamiento de las tierlists (colección ranking).
+#
+# Formato actual (uno por usuario y categoría, índice único user+categoryCode):
+#   {user, categoryCode, rankingDate, version, tiers: {"S": [codes], "A": [...], ...}}
+# Formato antiguo:
+#   {user, categoryCode, rankingDate, rankList: [{song, tier, score}, ...]}
+#
+# El score sale del tier, así que no se guarda. Las funciones de lectura y
+# RANKLIST_STAGE aceptan los dos formatos (manage.py migrate_tierlists convierte).
+
+TIERS = ("S", "A", "B", "C", "D")
+TIER_SCORE = {"S": 5, "A": 4, "B": 3, "C": 2, "D": 1}
+
+
+class VersionConflict(Exception):
+    """El ranking se ha guardado desde otro sitio desde que se cargó."""
+
+
+def empty_tiers():
+    return {tier: [] for tier in TIERS}
+
+
+def tiers_of(doc):
+    """Documento de ranking (cualquier formato) -> {tier: [codes]}."""
+    tiers = empty_tiers()
+    if not doc:
+        return tiers
+
+    if isinstance(doc.get("tiers"), dict):
+        for tier in TIERS:
+            tiers[tier] = [int(code) for code in doc["tiers"].get(tier) or []]
+        return tiers
+
+    for item in doc.get("rankList") or []:
+        tier = item.get("tier")
+        song = item.get("song")
+        if tier in tiers and song is not None:
+            tiers[tier].append(int(song))
+    return tiers
+
+
+def rank_list_of(doc):
+    """Documento de ranking (cualquier formato) -> [{song, tier, score}]."""
+    if doc and not isinstance(doc.get("tiers"), dict):
+        return list(doc.get("rankList") or [])
+    return [
+        {"song": code, "tier": tier, "score": TIER_SCORE[tier]}
+        for tier, codes in tiers_of(doc).items()
+        for code in codes
+    ]
+
+
+def placements_count(doc):
+    return sum(len(codes) for codes in tiers_of(doc).values())
+
+
+# Para pipelines sobre ranking: deja un rankList con el formato antiguo en los dos casos
+RANKLIST_STAGE = {"$addFields": {"rankList": {"$cond": [
+    {"$eq": [{"$type": "$tiers"}, "object"]},
+    {"$concatArrays": [
+        {"$map": {
+            "input": {"$ifNull": [f"$tiers.{tier}", []]},
+            "as": "code",
+            "in": {"song": "$$code", "tier": tier, "score": score},
+        }}
+        for tier, score in TIER_SCORE.items()
+    ]},
+    {"$ifNull": ["$rankList", []]},
+]}}}
+
+
+def get_tierlist(user, category_code):
+    return get_collection("ranking").find_one(
+        {"user": user, "categoryCode": int(category_code)},
+        sort=[("rankingDate", -1)],
+    )
+
+
+async def get_tierlist_async(user, category_code):
+    return await get_async_collection("ranking").find_one(
+        {"user": user, "categoryCode": int(category_code)},
+        sort=[("rankingDate", -1)],
+    )
+
+
+def _write_tierlist(user, category_code, update, expected_version, new_doc):
+    """Actualiza el ranking con la comprobación de versión, sin upsert.
+
+    expected_version: None = gana el último; 0 = todavía no existe (o es del
+    formato antiguo, sin versión); > 0 = la versión guardada tiene que coincidir.
+    Si no hay ranking que actualizar se inserta new_doc (None = no escribir
+    nada). Un desajuste de versión nunca crea un segundo ranking, aunque falte
+    el índice único (user, categoryCode).
+    Devuelve el documento anterior (None si se ha insertado o no se ha escrito).
+    """
+    collection = get_collection("ranking")
+    base = {"user": user, "categoryCode": int(category_code)}
+    query = dict(base)
+    if expected_version == 0:
+        query["$or"] = [{"version": 0}, {"version": {"$exists": False}}]
+    elif expected_version is not None:
+        query["version"] = expected_version
+
+    previous = collection.find_one_and_update(
+        query, update, sort=[("rankingDate", -1)], return_document=ReturnDocument.BEFORE,
+    )
+    if previous is not None:
+        return previous
+    if expected_version is not None and (expected_version > 0 or collection.find_one(base, {"_id": 1})):
+        raise VersionConflict()
+    if new_doc is None:
+        return None
+
+    try:
+        collection.insert_one({**base, **new_doc, "version": 1})
+    except DuplicateKeyError:
+        # Otro lo ha creado entre medias (con el índice único)
+        if expected_version is not None:
+            raise VersionConflict()
+        return _write_tierlist(user, category_code, update, None, None)
+    return None
+
+
+def save_tiers(user, category_code, tiers, ranking_date, expected_version=None):
+    """Guarda la tierlist con una sola escritura (o un insert si no existía).
+
+    Con expected_version solo se escribe si la versión guardada coincide
+    (0 = todavía no existe); si no, VersionConflict. Sin ella gana el último.
+    Devuelve (documento anterior o None, nueva versión).
+    """
+    tiers = {tier: [int(c) for c in tiers.get(tier, [])] for tier in TIERS}
+    previous = _write_tierlist(
+        user,
+        category_code,
+        {
+            "$set": {"tiers": tiers, "rankingDate": ranking_date},
+            "$unset": {"rankList": ""},
+            "$inc": {"version": 1},
+        },
+        expected_version,
+        {"tiers": tiers, "rankingDate": ranking_date},
+    )
+
+    old_version = (previous or {}).get("version", 0)
+    return previous, old_version + 1
+
+
+# -- Edición incremental (API de movimientos) --
+#
+# Un movimiento es (song, tier, index): quita la canción de donde esté y, si
+# tier no es None, la mete en esa posición del tier (index None = al final).
+# Se aplican en orden y todos en la misma actualización.
+
+MAX_MOVES = 100
+
+
+class BadMove(ValueError):
+    pass
+
+
+def parse_moves(ops):
+    if not isinstance(ops, list) or not ops:
+        raise BadMove("No moves")
+    if len(ops) > MAX_MOVES:
+        raise BadMove(f"Too many moves (max {MAX_MOVES})")
+
+    moves = []
+    for op in ops:
+        try:
+            song = int(op["song"])
+            tier = op.get("tier")
+            index = op.get("index")
+            index = int(index) if index is not None else None
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise BadMove("Bad move")
+        if tier is not None and tier not in TIERS:
+            raise BadMove(f"Unknown tier {tier}")
+        if index is not None and index < 0:
+            raise BadMove("Bad index")
+        moves.append((song, tier, index))
+    return moves
+
+
+def apply_moves(tiers, moves):
+    """Lo mismo que hace _moves_pipeline, sobre un dict {tier: [codes]}."""
+    tiers = {tier: list(tiers.get(tier, [])) for tier in TIERS}
+    for song, target, index in moves:
+        for tier in TIERS:
+            tiers[tier] = [code for code in tiers[tier] if code != song]
+        if target is not None:
+            codes = tiers[target]
+            codes.insert(len(codes) if index is None else index, song)
+    return tiers
+
+
+def _tier_expr(tier):
+    return {"$ifNull": [f"$tiers.{tier}", []]}
+
+
+def _moves_pipeline(moves, ranking_date):
+    # Los documentos antiguos se pasan antes a tiers para poder editarlos
+    pipeline = [{"$set": {"tiers": {"$cond": [
+        {"$eq": [{"$type": "$tiers"}, "object"]},
+        "$tiers",
+        {tier: {"$map": {
+            "input": {"$filter": {
+                "input": {"$ifNull": ["$rankList", []]},
+                "as": "item",
+                "cond": {"$eq": ["$$item.tier", tier]},
+            }},
+            "as": "item",
+            "in": {"$toInt": "$$item.song"},
+        }} for tier in TIERS},
+    ]}}}]
+
+    for song, target, index in moves:
+        pipeline.append({"$set": {
+            f"tiers.{tier}": {"$filter": {"input": _tier_expr(tier), "cond": {"$ne": ["$$this", song]}}}
+            for tier in TIERS
+        }})
+        if target is None:
+            continue
+
+        codes = _tier_expr(target)
+        if index is None:
+            placed = {"$concatArrays": [codes, [song]]}
+        elif index == 0:
+            placed = {"$concatArrays": [[song], codes]}
+        else:
+            placed = {"$concatArrays": [
+                {"$slice": [codes, index]},
+                [song],
+                {"$slice": [codes, index, {"$max": [{"$size": codes}, 1]}]},
+            ]}
+        pipeline.append({"$set": {f"tiers.{target}": placed}})
+
+    pipeline.append({"$set": {
+        "rankingDate": ranking_date,
+        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+    }})
+    pipeline.append({"$unset": "rankList"})
+    return pipeline
+
+
+def move_songs(user, category_code, moves, ranking_date, expected_version=None):
+    """Aplica los movimientos con una sola actualización (pipeline).
+
+    Misma comprobación de versión que save_tiers. Si no hay ranking se crea
+    con los movimientos aplicados, salvo que solo quiten canciones: entonces
+    no se escribe nada y devuelve None.
+    Devuelve (documento anterior o None, tiers nuevos, nueva versión).
+    """
+    created = apply_moves(empty_tiers(), moves)
+    previous = _write_tierlist(
+        user,
+        category_code,
+        _moves_pipeline(moves, ranking_date),
+        expected_version,
+        {"tiers": created, "rankingDate": ranking_date} if any(created.values()) else None,
+    )
+    if previous is None:
+        return (None, created, 1) if any(created.values()) else None
+
+    return previous, apply_moves(tiers_of(previous), moves), previous.get("version", 0) + 1
@@ -6,16 +6,22 @@ urlpatterns = [
     path('', go_door, name='go_door'),
     path('home/', go_home, name='go_home'),
     path('songs/', show_songs, name='show_songs'),
+    path('songs/page/', songs_page, name='songs_page'),
     path('songs/<int:songCode>/', view_song, name='view_song'),
     path('songs/<int:songCode>/review', add_review, name='add_review'),
+    path('songs/<int:songCode>/reviews/', song_reviews, name='song_reviews'),
     path('ranking/', show_categories, name='show_categories'),
     path('ranking/<int:category_code>/', go_ranking, name='go_ranking'),
     path('ranking/save/', save_tierlist, name='save_tierlist'),
+    path('ranking/<int:category_code>/moves/', move_tierlist_songs, name='move_tierlist_songs'),
     path('stats/global/', stats, name="stats"),
 
     # ADMIN PANEL CONTROL
     
     path('admin-panel/data_load', data_load, name='data_load'),
+    path('admin-panel/data_load/jobs/<str:job_id>/', import_job_status, name='import_job_status'),
+    path('admin-panel/data_load/jobs/<str:job_id>/cancel/', cancel_import_job, name='cancel_import_job'),
+    path('admin-panel/data_load/jobs/<str:job_id>/resume/', resume_import_job, name='resume_import_job'),
     path('admin-panel/categories/', go_categories, name='go_categories'),
     path("admin-panel/categories/<int:code>/songs/", category_songs, name="category_songs"),
     path("admin-panel/categories/<int:code>/songs/remove/", remove_songs_category, name="remove_songs_from_category"),
@@ -24,6 +30,8 @@ urlpatterns = [
     path('admin-panel/categories/delete/<int:code>/', delete_category, name='delete_category'),
     path('admin-panel', admin_panel, name='admin_panel'),
     path("admin-panel/users-panel/", users_panel, name="users_panel"),
+    path("admin-panel/slow-ops/", slow_ops, name="slow_ops"),
+    path('metrics', metrics, name='metrics'),
 
     # ACCESS
 
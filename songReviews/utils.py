@@ -0,0 +1,8 @@
+from itertools import islice
+
+
+def batched(iterable, size):
+    """Trocea un iterable en listas de como mucho `size` elementos."""
+    it = iter(iterable)
+    while chunk := list(islice(it, size)):
+        yield chunk
@@ -1,16 +1,39 @@
-import csv
+import asyncio
 import json
-from pymongo import MongoClient
+from asgiref.sync import sync_to_async
+from pymongo import ReturnDocument
 
 from django.shortcuts import render
 from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
-from django.db.models import Q
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import redirect
-
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.gzip import gzip_page
+
+from songReviews.catalog import get_catalog, invalidate_catalog, with_category_fields, with_song_fields
+from songReviews.categories import (
+    bump_category_versions, category_etag, category_songs_cached, category_songs_json, get_category,
+)
+from songReviews.counters import allocate_code
 from songReviews.forms import LoginForm, RegisterForm
+from songReviews.jobs import cancel_job, create_import_job, get_job, job_to_json, recent_jobs, resume_job
+from songReviews.metrics import render_metrics
+from songReviews.mongo_pool import get_async_collection, get_collection, get_db
+from songReviews.ratings import apply_review, get_summary_async, histogram_rows, top_reviewed_songs_async
+from songReviews.reviews import BadCursor, review_to_json, reviews_page, reviews_page_async
+from songReviews.search import ranked_songs
+from songReviews.slow_ops import threshold_ms, worst_offenders
+from songReviews.songs import song_cards_page
+from songReviews.stats_cache import acached_stat, invalidate_stats
+from songReviews.stats_snapshot import (
+    apply_tierlist_change, category_scores_async, snapshot_overview_async, top_avg_score_async,
+)
+from songReviews.tierlists import (
+    TIERS, VersionConflict, empty_tiers, get_tierlist, get_tierlist_async, move_songs, parse_moves,
+    placements_count, rank_list_of, save_tiers, tiers_of,
+)
 from songReviews.models import *
 
 # USER FUNCTIONS
@@ -23,51 +46,74 @@ def go_home(request):
 def show_songs(request):
     q = (request.GET.get("q") or "").strip()
 
-    songs = Song.objects.all()
-
-    if q:
-        songs = songs.filter(
-            Q(name__icontains=q) | Q(artist__icontains=q)
-        )
+    songs, next_cursor, total = song_cards_page(q)
 
-    return render(request, "songs.html", {"songs": songs, "q": q})
+    return render(request, "songs.html", {
+        "songs": songs,
+        "q": q,
+        "next_cursor": next_cursor,
+        "total": total,
+    })
 
+def songs_page(request):
+    q = (request.GET.get("q") or "").strip()
+    cursor = request.GET.get("cursor") or None
 
+    try:
+        songs, next_cursor, total = song_cards_page(q, cursor=cursor)
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Bad cursor"}, status=400)
 
-def view_song(request, songCode):
-    song = mongo(Song).get(code=int(songCode))
+    return JsonResponse({"songs": songs, "next_cursor": next_cursor, "total": total})
 
-    client = MongoClient("mongodb://localhost:27017")
-    db = client["songreviews"]
-    reviews_col = db["reviews"]
 
-    reviews = list(
-        reviews_col.find(
-            {"songCode": int(songCode)},
-            {"_id": 0}
-        ).sort("reviewDate", -1)
-    )
 
-    avg_rating = None
-    if reviews:
-        avg_rating = round(sum(r["rating"] for r in reviews) / len(reviews), 2)
+async def view_song(request, songCode):
+    song_code = int(songCode)
+    user = await request.auser()
 
+    # Consultas independientes: van a la vez
+    queries = [
+        get_async_collection("songs").find_one({"code": song_code}, {"_id": 0}),
+        reviews_page_async(song_code),
+        get_summary_async(song_code),
+    ]
     # UPDATE (if existing)
-    my_review = None
-    has_my_review = False
-    if request.user.is_authenticated:
-        my_review = reviews_col.find_one(
-            {"songCode": int(songCode), "user": request.user.username},
+    if user.is_authenticated:
+        queries.append(get_async_collection("reviews").find_one(
+            {"songCode": song_code, "user": user.username},
             {"_id": 0}
-        )
-        has_my_review = my_review is not None
+        ))
 
-    return render(request, "song_view.html", {
+    song, (reviews, next_cursor), summary, *mine = await asyncio.gather(*queries)
+    if song is None:
+        raise Http404("Song not found")
+
+    avg_rating = round(summary["avg"], 2) if summary["count"] else None
+    my_review = mine[0] if mine else None
+
+    return await sync_to_async(render)(request, "song_view.html", {
         "song": song,
         "reviews": reviews,
+        "next_cursor": next_cursor,
         "avg_rating": avg_rating,
+        "review_count": summary["count"],
+        "rating_histogram": histogram_rows(summary),
         "my_review": my_review,
-        "has_my_review": has_my_review,
+        "has_my_review": my_review is not None,
+    })
+
+def song_reviews(request, songCode):
+    cursor = request.GET.get("cursor") or None
+
+    try:
+        reviews, next_cursor = reviews_page(songCode, cursor=cursor)
+    except BadCursor:
+        return JsonResponse({"ok": False, "error": "Bad cursor"}, status=400)
+
+    return JsonResponse({
+        "reviews": [review_to_json(r) for r in reviews],
+        "next_cursor": next_cursor,
     })
 
 def add_review(request, songCode):
@@ -91,56 +137,57 @@ def add_review(request, songCode):
         else "Anonymous User"
     )
 
-    client = MongoClient("mongodb://localhost:27017")
-    db = client["songreviews"]
-    reviews_col = db["reviews"]
+    reviews_col = get_collection("reviews")
 
-    # Upsert lowkey
-    reviews_col.update_one(
+    # Upsert lowkey (BEFORE -> rating anterior para el delta del resumen)
+    previous = reviews_col.find_one_and_update(
         {"user": username, "songCode": int(songCode)},
         {"$set": {
             "reviewDate": timezone.now(),
             "rating": rating,
             "comments": comments,
         }},
-        upsert=True
+        projection={"_id": 0, "rating": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
     )
+    apply_review(songCode, previous.get("rating") if previous else None, rating)
+    invalidate_stats("top_reviewed")
 
     return redirect("view_song", songCode=songCode)
 
-def go_ranking(request, category_code):
+async def go_ranking(request, category_code):
     category_code = int(category_code)
+    user = await request.auser()
 
-    category = mongo(Category).get(code=category_code)
-    songs = mongo(Song).filter(categories__contains=[category_code])
+    category = await sync_to_async(get_category, thread_sensitive=False)(category_code)
+    if category is None:
+        raise Http404("Category not found")
 
-    saved_tiers = {"S": [], "A": [], "B": [], "C": [], "D": []}
+    songs_query = sync_to_async(category_songs_cached, thread_sensitive=False)(category)
+    if user.is_authenticated:
+        songs, existing = await asyncio.gather(songs_query, get_tierlist_async(user.username, category_code))
+    else:
+        songs, existing = await songs_query, None
+
+    saved_tiers = empty_tiers()
     has_saved = False
+    version = 0
+
+    if existing:
+        has_saved = True
+        saved_tiers = tiers_of(existing)
+        version = existing.get("version", 0)
 
-    if request.user.is_authenticated:
-        username = request.user.username
-        existing = (mongo(Ranking).filter(
-            user=username,
-            categoryCode=category_code)
-                    .order_by("-rankingDate").first())
-
-        if existing:
-            has_saved = True
-            saved_tiers = {"S": [], "A": [], "B": [], "C": [], "D": []}
-            for item in (existing.rankList or []):
-                tier = item.get("tier")
-                song = item.get("song")
-                if tier in saved_tiers and song is not None:
-                    saved_tiers[tier].append(int(song))
-
-    return render(request, "ranking_category.html", {
+    return await sync_to_async(render)(request, "ranking_category.html", {
         "category": category,
         "items": songs,
         "category_code": category_code,
-        "category_size": songs.count(),
-        "tiers": ["S", "A", "B", "C", "D"],
+        "category_size": len(songs),
+        "tiers": TIERS,
         "saved_tiers": json.dumps(saved_tiers),
         "has_saved": has_saved,
+        "version": version,
     })
 
 def save_tierlist(request):
@@ -156,39 +203,104 @@ def save_tierlist(request):
     tier_data = json.loads(request.POST.get("tier_data"))
 
     username = request.user.username
-    tier_score = {"S": 5, "A": 4, "B": 3, "C": 2, "D": 1}
-
-    rank_list = []
-    for tier, songs in tier_data.items():
-        for song_code in songs:
-            rank_list.append({
-                "song": int(song_code),
-                "tier": tier,
-                "score": tier_score.get(tier, 0),
-            })
 
-    if not rank_list:
+    tiers = {
+        tier: [int(song_code) for song_code in tier_data.get(tier, [])]
+        for tier in TIERS
+    }
+
+    if not any(tiers.values()):
         messages.warning(request, "No puedes guardar un ranking vacío.")
         return redirect("go_ranking", category_code=category_code)
 
-    existing = mongo(Ranking).filter(user=username, categoryCode=category_code).first()
+    version = request.POST.get("version")
+    expected_version = int(version) if version not in (None, "") else None
 
-    if existing:
-        mongo(Ranking).filter(id=existing.id).update(
-            rankingDate=timezone.now(),
-            rankList=rank_list
-        )
-    else:
-        ranking = Ranking(
-            user=username,
-            rankingDate=timezone.now(),
-            categoryCode=category_code,
-            rankList=rank_list
-        )
-        ranking.save(using="mongodb")
+    try:
+        previous, _ = save_tiers(username, category_code, tiers, timezone.now(), expected_version)
+    except VersionConflict:
+        messages.warning(request, "Tu ranking se ha guardado desde otra pestaña. Revisa los cambios y vuelve a guardar.")
+        return redirect("go_ranking", category_code=category_code)
+
+    apply_tierlist_change(
+        category_code,
+        rank_list_of(previous) if previous else None,
+        rank_list_of({"tiers": tiers}),
+        is_new=previous is None,
+    )
+    invalidate_stats("overview", "top_avg_score", "categories")
 
     return redirect("go_ranking", category_code=category_code)
 
+def _tierlist_state(username, category_code):
+    current = get_tierlist(username, category_code)
+    return {
+        "version": current.get("version", 0) if current else 0,
+        "tiers": tiers_of(current),
+    }
+
+
+def move_tierlist_songs(request, category_code):
+    if request.method not in ("GET", "POST"):
+        return JsonResponse({"ok": False, "error": "GET or POST only"}, status=405)
+
+    if not request.user.is_authenticated:
+        return JsonResponse({"ok": False, "error": "Login required"}, status=401)
+
+    if request.method == "GET":
+        # Lo guardado, para que el cliente se resincronice tras un error
+        return JsonResponse(_tierlist_state(request.user.username, category_code))
+
+    try:
+        payload = json.loads(request.body)
+        moves = parse_moves(payload.get("ops"))
+        version = payload.get("version")
+        expected_version = int(version) if version is not None else None
+    except (ValueError, TypeError, AttributeError) as e:
+        # BadMove es un ValueError (igual que json.JSONDecodeError)
+        return JsonResponse({"ok": False, "error": str(e) or "Bad request"}, status=400)
+
+    category = get_category(category_code)
+    if category is None:
+        return JsonResponse({"ok": False, "error": "Category not found"}, status=404)
+
+    # Solo se colocan canciones de la categoría; quitar una que ya no está
+    # en ella se deja (así se limpian los rankings viejos)
+    allowed = {song["code"] for song in category_songs_cached(category)}
+    if any(tier is not None and song not in allowed for song, tier, _ in moves):
+        return JsonResponse({"ok": False, "error": "Song not in category"}, status=400)
+
+    username = request.user.username
+
+    try:
+        result = move_songs(username, category_code, moves, timezone.now(), expected_version)
+    except VersionConflict:
+        # Se devuelve lo guardado para que el cliente se resincronice
+        return JsonResponse({
+            "ok": False,
+            "error": "Version conflict",
+            **_tierlist_state(username, category_code),
+        }, status=409)
+
+    if result is None:
+        # Solo quitaba canciones de un ranking que no existe
+        response = HttpResponse(status=204)
+        response["X-Ranking-Version"] = "0"
+        return response
+
+    previous, tiers, version = result
+    apply_tierlist_change(
+        category_code,
+        rank_list_of(previous) if previous else None,
+        rank_list_of({"tiers": tiers}),
+        is_new=previous is None,
+    )
+    invalidate_stats("overview", "top_avg_score", "categories")
+
+    response = HttpResponse(status=204)
+    response["X-Ranking-Version"] = str(version)
+    return response
+
 # -- ADMIN FUNCTIONS --
 def go_categories(request):
 
@@ -201,7 +313,7 @@ def go_categories(request):
     songs = mongo(Song).all().order_by("code")
 
     if q:
-        songs = songs.filter(Q(name__icontains=q) | Q(artist__icontains=q))
+        songs = ranked_songs(songs, q)
 
     if request.method == "POST":
         category = Category()
@@ -209,9 +321,9 @@ def go_categories(request):
         category.description = request.POST.get("description")
         category.logo = request.POST.get("logo")
 
-        last = mongo(Category).order_by("code").last()
-        category.code = (last.code if last else 0) + 1
+        category.code = allocate_code(get_db(), "categories")
         category.save(using="mongodb")
+        invalidate_catalog(songs=False)
 
         return redirect("go_categories")
 
@@ -235,18 +347,18 @@ def add_songs_category(request):
     if not selected_codes or not category_codes:
         return redirect("go_categories")
 
-    client = MongoClient("mongodb://localhost:27017")
-    col = client["songreviews"]["songs"]
+    col = get_collection("songs")
 
     col.update_many(
         {"code": {"$in": selected_codes}},
         {"$addToSet": {"categories": {"$each": category_codes}}}
     )
+    bump_category_versions(category_codes)
 
     return redirect("go_categories")
 
 def show_categories(request):
-    categories = mongo(Category).all().order_by('code')
+    categories = get_catalog().all_categories()
     return render(request, "ranking.html", {"categories": categories})
 
 def update_category(request):
@@ -270,24 +382,24 @@ def update_category(request):
         logo=logo,
         description=description
     )
+    invalidate_catalog(songs=False)
 
     return redirect("go_categories")
 
+@gzip_page
 def category_songs(request, code):
-    code = int(code)
-
-    songs = mongo(Song).filter(categories__contains=[code]).order_by("code")
-
-    data = []
-    for s in songs:
-        data.append({
-            "code": int(s.code),
-            "name": s.name,
-            "artist": s.artist,
-            "artwork": s.artwork,
-        })
+    category = get_category(code)
+    if category is None:
+        return JsonResponse({"ok": False, "error": "Category not found"}, status=404)
 
-    return JsonResponse({"songs": data})
+    # El ETag es la versión de la lista: si el navegador ya la tiene, 304 sin cuerpo
+    etag = category_etag(category)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(category_songs_json(category), content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 def remove_songs_category(request, code):
@@ -309,13 +421,13 @@ def remove_songs_category(request, code):
     if not song_codes:
         return JsonResponse({"ok": False, "error": "No songs selected"}, status=400)
 
-    client = MongoClient("mongodb://localhost:27017")
-    col = client["songreviews"]["songs"]
+    col = get_collection("songs")
 
     res = col.update_many(
         {"code": {"$in": song_codes}},
         {"$pull": {"categories": code}}
     )
+    bump_category_versions([code])
 
     return JsonResponse({"ok": True, "modified": res.modified_count})
 
@@ -324,192 +436,109 @@ def delete_category(request, code):
         return HttpResponseForbidden("Not allowed")
 
     code = int(code)
+    # Primero la versión (por si alguien tiene la lista cacheada con la actual)
+    bump_category_versions([code])
     mongo(Category).filter(code=code).delete()
 
-    client = MongoClient("mongodb://localhost:27017")
-    col = client["songreviews"]["songs"]
+    col = get_collection("songs")
     col.update_many({"categories": code}, {"$pull": {"categories": code}})
+    invalidate_catalog(songs=False)
 
     return redirect("go_categories")
 
 
-def stats(request):
-    client = MongoClient("mongodb://localhost:27017")
-    db = client["songreviews"]
+async def stats(request):
+    # Las cuatro consultas son independientes: la página tarda lo que la más lenta
+    overview, top_avg, top_reviewed, categories = await asyncio.gather(
+        acached_stat("overview", snapshot_overview_async),
+        acached_stat("top_avg_score", top_avg_score_async),
+        acached_stat("top_reviewed", top_reviewed_songs_async),
+        acached_stat("categories", category_scores_async),
+    )
+    return await sync_to_async(render)(request, "stats.html", {
+        "overview": overview,
+        "top_avg_score": top_avg,
+        "top_reviewed": top_reviewed,
+        "categories": categories,
+    })
 
-    rankings_col = db["ranking"]
-    reviews_col  = db["reviews"]
+def data_load(request):
+    if getattr(request.user, "role", None) != "admin":
+        return HttpResponseForbidden("Not allowed")
+    if request.method == "POST":
+        uploaded_file = request.FILES.get('csvFile')
 
-    # 0 OVERVIEW
-    total_rankings = rankings_col.count_documents({})
+        if not uploaded_file:
+            return render(request, 'data_load.html', {
+                'error': 'No se seleccionó ningún archivo.',
+                'jobs': recent_jobs(),
+            })
 
-    total_placements_agg = list(rankings_col.aggregate([
-        {"$unwind": "$rankList"},
-        {"$group": {"_id": None, "total": {"$sum": 1}}}
-    ]))
-    total_placements = int(total_placements_agg[0]["total"]) if total_placements_agg else 0
+        # La importación va en segundo plano; la página consulta el progreso
+        job_id = create_import_job(uploaded_file, request.user.username)
+        return redirect(f"{reverse('data_load')}?job={job_id}")
 
-    overview = {
-        "total_rankings": total_rankings,
-        "total_placements": total_placements,
-    }
+    # Un ?job= que no es un job (p.ej. con "/") rompería los {% url %} de la plantilla
+    job_id = request.GET.get("job") or ""
+    if job_id and get_job(job_id) is None:
+        job_id = ""
 
-    # 1 TOP: MÁS APARECEN EN S
+    return render(request, 'data_load.html', {
+        'job_id': job_id,
+        'jobs': recent_jobs(),
+    })
 
-    top_avg_score_pipeline = [
-        {"$unwind": "$rankList"},
+def import_job_status(request, job_id):
+    if getattr(request.user, "role", None) != "admin":
+        return HttpResponseForbidden("Not allowed")
 
-        # Asegura que score es numérico
-        {"$addFields": {
-            "scoreInt": {"$toInt": {"$ifNull": ["$rankList.score", 0]}}
-        }},
+    job = get_job(job_id)
+    if job is None:
+        return JsonResponse({"ok": False, "error": "Job not found"}, status=404)
 
-        {"$group": {
-            "_id": "$rankList.song",
-            "avgScore": {"$avg": "$scoreInt"},
-            "votes": {"$sum": 1},
-            "sCount": {"$sum": {"$cond": [{"$eq": ["$scoreInt", 5]}, 1, 0]}},
-        }},
+    return JsonResponse(job_to_json(job))
 
-        # opcional: evita que gane una canción con 1 sola aparición
-        {"$match": {"votes": {"$gte": 2}}},
+def cancel_import_job(request, job_id):
+    if getattr(request.user, "role", None) != "admin":
+        return HttpResponseForbidden("Not allowed")
 
-        {"$addFields": {
-            "sRate": {"$cond": [{"$gt": ["$votes", 0]}, {"$divide": ["$sCount", "$votes"]}, 0]}
-        }},
+    if request.method != "POST":
+        return JsonResponse({"ok": False, "error": "POST only"}, status=405)
 
-        # Orden principal: media, luego votos (para desempatar)
-        {"$sort": {"avgScore": -1, "votes": -1}},
+    if not cancel_job(job_id):
+        return JsonResponse({"ok": False, "error": "Job is not running"}, status=409)
+    return JsonResponse({"ok": True})
 
-        {"$limit": 20},
+def resume_import_job(request, job_id):
+    if getattr(request.user, "role", None) != "admin":
+        return HttpResponseForbidden("Not allowed")
 
-        {"$lookup": {
-            "from": "songs",
-            "localField": "_id",
-            "foreignField": "code",
-            "as": "song"
-        }},
-        {"$unwind": {"path": "$song", "preserveNullAndEmptyArrays": True}},
-        {"$project": {
-            "_id": 0,
-            "code": "$_id",
-            "avg": {"$round": ["$avgScore", 2]},
-            "votes": 1,
-            "sRate": {"$round": [{"$multiply": ["$sRate", 100]}, 1]},
-            "name": {"$ifNull": ["$song.name", {"$concat": ["Song #", {"$toString": "$_id"}]}]},
-            "artist": {"$ifNull": ["$song.artist", ""]},
-            "artwork": {"$ifNull": ["$song.artwork", ""]},
-        }},
-    ]
-    top_avg_score = list(rankings_col.aggregate(top_avg_score_pipeline))
-    # 2 TOP REVIEWS: MEJOR VALORADAS (reviews 1–5)
-
-    top_reviewed_pipeline = [
-        {"$group": {
-            "_id": "$songCode",
-            "avgRating": {"$avg": "$rating"},
-            "reviews": {"$sum": 1}
-        }},
-        {"$match": {"reviews": {"$gte": 2}}},   # mínimo para que no gane una con 1 review
-        {"$sort": {"avgRating": -1, "reviews": -1}},
-        {"$limit": 20},
-        {"$lookup": {
-            "from": "songs",
-            "localField": "_id",
-            "foreignField": "code",
-            "as": "song"
-        }},
-        {"$unwind": {"path": "$song", "preserveNullAndEmptyArrays": True}},
-        {"$project": {
-            "_id": 0,
-            "code": "$_id",
-            "avg": {"$round": ["$avgRating", 2]},
-            "reviews": 1,
-            "name": {"$ifNull": ["$song.name", {"$concat": ["Song #", {"$toString": "$_id"}]}]},
-            "artist": {"$ifNull": ["$song.artist", ""]},
-            "artwork": {"$ifNull": ["$song.artwork", ""]},
-        }}
-    ]
-    top_reviewed = list(reviews_col.aggregate(top_reviewed_pipeline))
+    if request.method != "POST":
+        return JsonResponse({"ok": False, "error": "POST only"}, status=405)
 
-    # 3 MEDIA DE TIER POR CATEGORÍA
+    if not resume_job(job_id):
+        return JsonResponse({"ok": False, "error": "Job cannot be resumed"}, status=409)
+    return JsonResponse({"ok": True})
 
-    avg_by_category_pipeline = [
-        {"$unwind": "$rankList"},
-        {"$group": {
-            "_id": "$categoryCode",
-            "avgScore": {"$avg": "$rankList.score"},   # score ya es 5..1
-            "placements": {"$sum": 1},
-            "rankingIds": {"$addToSet": "$_id"},
-        }},
-        {"$addFields": {"rankingCount": {"$size": "$rankingIds"}}},
-        {"$sort": {"avgScore": -1, "placements": -1}},
-        {"$lookup": {
-            "from": "categories",
-            "localField": "_id",
-            "foreignField": "code",
-            "as": "cat"
-        }},
-        {"$unwind": {"path": "$cat", "preserveNullAndEmptyArrays": True}},
-        {"$project": {
-            "_id": 0,
-            "code": "$_id",
-            "avg": {"$round": ["$avgScore", 2]},
-            "placements": 1,
-            "rankingCount": 1,
-            "name": {"$ifNull": ["$cat.name", {"$concat": ["Category #", {"$toString": "$_id"}]}]},
-            "logo": {"$ifNull": ["$cat.logo", ""]},
-        }}
-    ]
-    categories = list(rankings_col.aggregate(avg_by_category_pipeline))
+def metrics(request):
+    if getattr(request.user, "role", None) != "admin":
+        return HttpResponseForbidden("Not allowed")
 
-    return render(request, "stats.html", {
-        "overview": overview,
-        "top_avg_score": top_avg_score,
-        "top_reviewed": top_reviewed,
-        "categories": categories,
-    })
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
-def data_load(request):
+def slow_ops(request):
     if getattr(request.user, "role", None) != "admin":
         return HttpResponseForbidden("Not allowed")
-    if request.method == "POST":
-        uploaded_file = request.FILES.get('csvFile')
 
-        if not uploaded_file:
-            return render(request, 'data_load.html', {
-                'error': 'No se seleccionó ningún archivo.'
-            })
+    offenders = worst_offenders()
+    for op in offenders:
+        op["query_json"] = json.dumps(op.get("query"), indent=2, default=str)
+        op["explain_json"] = json.dumps(op["explain"], indent=2, default=str) if op.get("explain") else ""
 
-        decoded_file = uploaded_file.read().decode('utf-8').splitlines()
-        reader = csv.DictReader(decoded_file)
-
-        for row in reader:
-            try:
-                categories = [
-                    int(c.strip())
-                    for c in row["categories"].split(",")
-                    if c.strip().isdigit()
-                ]
-
-                song = Song(
-                    code=int(row['code']),
-                    name=row['name'],
-                    artist=row['artist'],
-                    duration=int(row['duration']),
-                    artwork=row["artwork"],
-                    releaseDate = row['releaseDate'],
-                    categories=categories,
-                )
-                song.save()
-
-            except Exception as e:
-                print("Error en fila: ", row, e)
-
-        return render(request, 'data_load.html', {
-            'success': "Canciones cargadas correctamente."
-        })
-    return render(request, 'data_load.html')
+    return render(request, "slow_ops.html", {
+        "offenders": offenders,
+        "threshold_ms": threshold_ms(),
+    })
 
 def admin_panel(request):
     if getattr(request.user, "role", None) != "admin":
@@ -517,65 +546,64 @@ def admin_panel(request):
 
     return render(request, 'admin.html')
 
-def users_panel(request):
-    if getattr(request.user, "role", None) != "admin":
+async def users_panel(request):
+    user = await request.auser()
+    if getattr(user, "role", None) != "admin":
         return HttpResponseForbidden("Not allowed")
 
-    users = User.objects.all().order_by("username")
-
-    rankings_qs = mongo(Ranking).all().order_by("-rankingDate")[:50]
-    categories_qs = mongo(Category).all()
-
-    cat_map = {int(c.code): c for c in categories_qs}
+    # TOP 5 MOST RECENT REVIEWS va junto con usuarios y rankings
+    users, rankings_docs, recent = await asyncio.gather(
+        _all_users(),
+        get_async_collection("ranking")
+        .find({}, {"_id": 0, "user": 1, "rankingDate": 1, "categoryCode": 1, "tiers": 1, "rankList": 1})
+        .sort("rankingDate", -1)
+        .limit(50)
+        .to_list(),
+        get_async_collection("reviews")
+        .find({}, {"_id": 0})
+        .sort("reviewDate", -1)
+        .limit(5)
+        .to_list(),
+    )
 
     rankings = []
-    for r in rankings_qs:
-        cat = cat_map.get(int(r.categoryCode)) if r.categoryCode is not None else None
+    for r in rankings_docs:
+        category_code = r.get("categoryCode")
         rankings.append({
-            "user": r.user,
-            "rankingDate": r.rankingDate,
-            "categoryCode": int(r.categoryCode) if r.categoryCode is not None else None,
-            "category_name": getattr(cat, "name", f"Category #{r.categoryCode}"),
-            "category_logo": getattr(cat, "logo", ""),
-            "items_count": len(r.rankList or []),
+            "user": r.get("user"),
+            "rankingDate": r.get("rankingDate"),
+            "code": int(category_code) if category_code is not None else None,
+            "items_count": placements_count(r),
         })
 
-    # TOP 5 MOST RECENT REVIEWS
-    client = MongoClient("mongodb://localhost:27017")
-    db = client["songreviews"]
-    reviews_col = db["reviews"]
-
-    recent = list(
-        reviews_col.find({}, {"_id": 0})
-        .sort("reviewDate", -1)
-        .limit(5)
-    )
-
-    song_codes = [int(x.get("songCode")) for x in recent if x.get("songCode") is not None]
-    songs = list(mongo(Song).filter(code__in=song_codes))
-    song_map = {int(s.code): s for s in songs}
+    await sync_to_async(with_category_fields, thread_sensitive=False)(rankings)
+    for r in rankings:
+        r["categoryCode"] = r.pop("code")
+        r["category_name"] = r.pop("name")
+        r["category_logo"] = r.pop("logo")
 
     recent_reviews = []
-    for rev in recent:
-        code = rev.get("songCode")
-        s = song_map.get(int(code)) if code is not None else None
+    for rev in await sync_to_async(with_song_fields, thread_sensitive=False)(recent, key="songCode"):
         recent_reviews.append({
             "user": rev.get("user", "Anonymous"),
-            "songCode": code,
-            "song_name": getattr(s, "name", f"Song #{code}"),
-            "artist": getattr(s, "artist", ""),
-            "artwork": getattr(s, "artwork", ""),
+            "songCode": rev.get("songCode"),
+            "song_name": rev["name"],
+            "artist": rev["artist"],
+            "artwork": rev["artwork"],
             "rating": rev.get("rating", ""),
             "comments": rev.get("comments", ""),
             "reviewDate": rev.get("reviewDate", ""),
         })
 
-    return render(request, "users_panel.html", {
+    return await sync_to_async(render)(request, "users_panel.html", {
         "users": users,
         "rankings": rankings,
         "recent_reviews": recent_reviews,
     })
 
+async def _all_users():
+    return [u async for u in User.objects.all().order_by("username")]
+
 # -- ACCESS FUNCTIONS --
 def do_login(request):
     next_url = request.GET.get("next") or request.POST.get("next") or reverse("go_home")